@@ -47,6 +47,32 @@ class DataAnalysis:
             plt.plot(x, out.best_fit, color = 'darkslateblue',label = 'Fano resonance fit')
         return dic
 
+    def estimate_resonance(self,freq,trace):
+        # Fast, fit free estimate of a transmission peak (trace in dB).
+        # Returns centre and fwhm in Hz, Q, and the peak contrast in dB above
+        # the median background, which is small when there is no resonance.
+        freq = np.asarray(freq)
+        trace = np.asarray(trace)
+        if np.iscomplexobj(trace):
+            trace = trace.real
+
+        imax = int(np.argmax(trace))
+        background = np.median(trace)
+        contrast = trace[imax] - background
+
+        # half power level between background and peak, in linear units
+        lin = 10**(trace/10)
+        half = (lin[imax] + 10**(background/10))/2
+        below = lin < half
+        left = np.flatnonzero(below[:imax])
+        right = np.flatnonzero(below[imax:])
+        flow = freq[left[-1]] if left.size else freq[0]
+        fup = freq[imax + right[0]] if right.size else freq[-1]
+        fwhm = max(fup - flow, freq[1] - freq[0]) if freq.size > 1 else 0.
+
+        return {'centre':freq[imax],'fwhm':fwhm,
+                'Q':freq[imax]/fwhm if fwhm else np.inf,'contrast':contrast}
+
     def fit_3dB(self,freq,trace,freqbounds=()):
 
         if np.any(np.iscomplex(trace)):
@@ -54,4 +54,19 @@ class DatabaseHandler:
         #data_set.add_parameter(ParamSpec(name = 'CenterFreq',unit='Hz',paramtype='numeric'))
         #data_set.add_parameter(ParamSpec(name = 'phase',unit='deg',paramtype='array'))
         #data_set.add_parameter(ParamSpec(name = 'magnitude',unit='dB',paramtype='array'))
-        #data_set.add_parameter(ParamSpec(name = 'frequency',unit='Hz',paramtype='array'))
\ No newline at end of file
+        #data_set.add_parameter(ParamSpec(name = 'frequency',unit='Hz',paramtype='array'))
+
+    def add_trace(self,caled_field,frequency,magnitude,phase,set_power,temp=None,thermometer=None):
+        # temp defaults to the latest reading of thermometer, a Keithley_2400
+        # streaming with start_stream(), so the VNA loop never waits for it.
+        # A stopped stream raises rather than silently storing temp=None.
+        if temp is None and thermometer is not None:
+            if not thermometer.is_streaming():
+                raise RuntimeError('Thermometer is not streaming, call start_stream() first')
+            temp = thermometer.latest_temperature()
+        self.data_set.add_result({'caled_field':caled_field,
+                                  'frequency':frequency,
+                                  'magnitude':magnitude,
+                                  'phase':phase,
+                                  'temp':temp,
+                                  'set_power':set_power})
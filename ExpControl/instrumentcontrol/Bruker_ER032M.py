@@ -0,0 +1,103 @@
+import re
+from qcodes import VisaInstrument
+from qcodes.utils import validators as vals
+
+
+class Bruker_ER032M(VisaInstrument):
+    """
+    qcodes driver for the Bruker ER 032M field controller, talking GPIB
+    through a Prologix GPIB-USB adapter on a (virtual) serial port.
+
+    The VISA session stays open for the lifetime of the driver, so the
+    adapter is only configured once.
+
+    Parameters:
+    - cf: raw centre field setting of the controller (G)
+    - field: field at the sample (G); cf = field*field_cal
+    - ramp_rate: model ramp rate of the magnet (G/s), used by ramp_time()
+
+    Usage:
+    prx = Bruker_ER032M('er032m', 'COM21')
+    prx.field(1000)
+    prx.ramp_time(1200) # estimated seconds to go to 1200 G
+    """
+    def __init__(self, name, address, gpib_address=2, field_cal=1.371742112,
+                 zero_field=102.10, ramp_rate=50, dead_time=2, **kwargs):
+
+        super().__init__(name=name, address=address, terminator='\n', **kwargs)
+
+        self.field_cal = field_cal
+        self.zero_field = zero_field # CF setting for zero field (G)
+        self._last_cf = None
+
+        # Prologix adapter setup, once per session
+        self.visa_handle.write('++mode 1') # Controller
+        self.visa_handle.write('++auto 0') # listen
+        self.visa_handle.write('++addr {:d}'.format(gpib_address))
+        self.visa_handle.write('++eos 0') # CR/LF
+        self.visa_handle.write('++eoi 1') # Enable EOI assertion
+
+        self.add_parameter(name='cf',
+                           label='Centre field setting',
+                           unit='G',
+                           get_cmd='CF',
+                           get_parser=self._field_parser,
+                           set_cmd=self._set_cf,
+                           vals=vals.Numbers(-50, 25000))
+
+        self.add_parameter(name='field',
+                           label='Field',
+                           unit='G',
+                           get_cmd=lambda: self.cf()/self.field_cal,
+                           set_cmd=lambda val: self.cf(val*self.field_cal))
+
+        self.add_parameter(name='ramp_rate',
+                           label='Ramp rate',
+                           unit='G/s',
+                           get_cmd=None,
+                           set_cmd=None,
+                           initial_value=ramp_rate,
+                           vals=vals.Numbers(0.001, 1e4))
+
+        self.add_parameter(name='dead_time',
+                           label='Ramp dead time',
+                           unit='s',
+                           get_cmd=None,
+                           set_cmd=None,
+                           initial_value=dead_time,
+                           vals=vals.Numbers(0, 600))
+
+        self.connect_message()
+
+    def ask_raw(self, cmd):
+        # with ++auto 0 the adapter needs an explicit read request
+        self.visa_handle.write(cmd)
+        self.visa_handle.write('++read eoi')
+        return self.visa_handle.read()
+
+    def get_idn(self):
+        return {'vendor': 'Bruker', 'model': 'ER 032M',
+                'serial': None, 'firmware': None}
+
+    def _set_cf(self, val):
+        self.write('CF{:+.2f}'.format(val)) # CF+1234.56 or CF-50.00
+        self._last_cf = val
+
+    def _field_parser(self, msg):
+        # responses look like 'CF+1234.56'
+        match = re.search(r'[-+]?\d+(\.\d*)?', msg)
+        if match is None:
+            raise ValueError('Cannot parse field from {!r}'.format(msg))
+        return float(match.group())
+
+    def zero(self):
+        self.cf(self.zero_field)
+
+    def ramp_time(self, cf):
+        """Modelled time (s) to ramp from the last set CF to cf and settle."""
+        last = self.zero_field if self._last_cf is None else self._last_cf
+        return self.step_time(cf - last)
+
+    def step_time(self, step):
+        """Modelled time (s) to ramp by step (G) and settle."""
+        return self.dead_time() + abs(step)/self.ramp_rate()
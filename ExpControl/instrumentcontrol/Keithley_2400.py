@@ -1,5 +1,19 @@
+import sys
+import time
+import logging
+import threading
+from collections import namedtuple
+import numpy as np
 from qcodes import VisaInstrument
-from qcodes.utils.validators import Strings
+from qcodes.utils.validators import Strings, Bool
+from .RingBuffer import RingBuffer
+
+Reading = namedtuple('Reading', ['volt', 'curr', 'resistance'])
+
+# :FORM:ELEM elements, in the order the instrument always sends them
+_ELEMENTS = ('VOLT', 'CURR', 'RES', 'TIME', 'STAT')
+
+log = logging.getLogger(__name__)
 
 
 class Keithley_2400(VisaInstrument):
@@ -7,6 +21,17 @@ class Keithley_2400(VisaInstrument):
     def __init__(self, name, address, **kwargs):
         super().__init__(name, address, terminator='\n', **kwargs)
 
+        self._reversal = None # (current, pairs) of the loaded source list
+        self._elements = _ELEMENTS # *RST default
+        self._binary = False
+        self._elements_before_reversal = _ELEMENTS
+        self.last_reading = None
+        # serialises bus access between the streaming thread and callers
+        self._lock = threading.RLock()
+        self.stream = None
+        self._stream_thread = None
+        self._stream_stop = threading.Event()
+
         self.add_parameter('rangev',
                            get_cmd='SENS:VOLT:RANG?',
                            get_parser=float,
@@ -32,15 +57,13 @@ class Keithley_2400(VisaInstrument):
                            label='Current Compliance')
 
         self.add_parameter('volt',
-                           get_cmd=':READ?',
-                           get_parser=self._volt_parser, 
+                           get_cmd=lambda: self._reading_field('volt'),
                            set_cmd=':SOUR:VOLT:LEV {:.8f}',
                            label='Voltage',
                            unit='V')
 
         self.add_parameter('curr', 
-                           get_cmd=':READ?',
-                           get_parser=self._curr_parser, 
+                           get_cmd=lambda: self._reading_field('curr'),
                            set_cmd=':SOUR:CURR:LEV {:.8f}',
                            label='Current',
                            unit='A')
@@ -75,10 +98,195 @@ class Keithley_2400(VisaInstrument):
                            label='Current integration time')
 
         self.add_parameter('resistance',
-                           get_cmd=':READ?',
-                           get_parser=self._resistance_parser, 
-                           label='Voltage',
-                           unit='V')
+                           get_cmd=lambda: self._reading_field('resistance'),
+                           label='Resistance',
+                           unit='Ohm')
+
+        self.add_parameter('reading',
+                           get_cmd=self._read,
+                           label='Voltage, current and resistance from one :READ?')
+
+        self.add_parameter('cached_readings',
+                           get_cmd=None,
+                           set_cmd=None,
+                           initial_value=False,
+                           vals=Bool(),
+                           label='volt/curr/resistance use the last reading')
+
+        self.add_parameter('resistance_reversal',
+                           get_cmd=self._measure_reversal,
+                           label='Current reversal resistance',
+                           unit='Ohm')
+
+    def configure_reversal(self, current, pairs=1, on_instrument=False):
+        """
+        Program a current reversal (delta) measurement: a source list of
+        +I, -I repeated 'pairs' times, read in one trigger sequence into the
+        trace buffer with the output switched on only while measuring.
+        resistance_reversal() then returns the mean resistance, averaged on
+        the instrument (CALC3 MEAN) if on_instrument else on the host.
+        Call reversal_off() to go back to the fixed source mode.
+        """
+        n = 2*pairs
+        levels = ','.join('{:.8e}'.format(i) for i in [current, -current]*pairs)
+        self.write(':SOUR:FUNC CURR')
+        self.write(':SOUR:CURR:MODE LIST')
+        self.write(':SOUR:LIST:CURR {}'.format(levels))
+        self.write(':SOUR:CLE:AUTO ON') # output on only during readings
+        self.write(':TRIG:COUN {:d}'.format(n))
+        if self._reversal is None:
+            self._elements_before_reversal = self._elements
+        self.read_format(('RES',), binary=self._binary)
+        self.write(':TRAC:CLE')
+        self.write(':TRAC:POIN {:d}'.format(n))
+        self.write(':TRAC:FEED SENS')
+        if on_instrument:
+            self.write(':CALC3:FORM MEAN')
+        self._reversal = (current, pairs, on_instrument)
+
+    def reversal_off(self):
+        self.write(':TRAC:FEED:CONT NEV')
+        self.write(':SOUR:CLE:AUTO OFF')
+        self.write(':SOUR:CURR:MODE FIX')
+        self.write(':TRIG:COUN 1')
+        self.read_format(self._elements_before_reversal, binary=self._binary)
+        self._reversal = None
+
+    def _measure_reversal(self):
+        if self._reversal is None:
+            raise RuntimeError('Call configure_reversal() first')
+        current, pairs, on_instrument = self._reversal
+        with self._lock:
+            self.write(':TRAC:CLE')
+            self.write(':TRAC:FEED:CONT NEXT')
+            self.write(':INIT')
+            self.ask('*OPC?') # wait for the whole source list
+            if on_instrument:
+                return float(self._query_values(':CALC3:DATA?')[0])
+            return self._query_values(':TRAC:DATA?').mean()
+
+    def read_format(self, elements=('VOLT', 'CURR', 'RES'), binary=False):
+        """
+        Only send the given :FORM:ELEM elements with each reading, as ASCII
+        or (binary=True) 32 bit floats in host byte order.
+        """
+        elements = tuple(e for e in _ELEMENTS
+                         if e in [x.upper() for x in elements])
+        self.write(':FORM:ELEM {}'.format(','.join(elements)))
+        if binary:
+            self.write(':FORM:BORD {}'.format(
+                'SWAP' if sys.byteorder == 'little' else 'NORM'))
+            self.write(':FORM:DATA REAL,32')
+        else:
+            self.write(':FORM:DATA ASC')
+        self._elements = elements
+        self._binary = binary
+
+    def _query_values(self, cmd):
+        if self._binary:
+            return self._query_binary(cmd)
+        return np.array(self.ask(cmd).split(','), dtype=float)
+
+    def _query_binary(self, cmd):
+        # REAL,32 comes as an indefinite '#0' block followed by the line
+        # terminator. The payload may contain 0x0A bytes, so the read must
+        # end on EOI only, not on the termination character.
+        handle = self.visa_handle
+        termination = handle.read_termination
+        handle.read_termination = None
+        try:
+            handle.write(cmd)
+            raw = handle.read_raw()
+        finally:
+            handle.read_termination = termination
+        if not raw.startswith(b'#0'):
+            raise ValueError('Expected a #0 block, got {!r}'.format(raw[:10]))
+        payload = raw[2:]
+        payload = payload[:len(payload) - len(payload) % 4] # drop the terminator
+        return np.frombuffer(payload, dtype=np.float32).copy() # host order, see read_format
+
+    def _read(self):
+        # one :READ? -> Reading(volt, curr, resistance), missing elements are
+        # nan; resistance is V/I when both are sent, as before. With a
+        # reversal loaded :READ? would return the whole +I/-I list, so the
+        # reading is the reversal resistance instead.
+        if self._reversal is not None:
+            self.last_reading = Reading(np.nan, np.nan, float(self._measure_reversal()))
+            return self.last_reading
+        with self._lock:
+            values = self._query_values(':READ?')
+        fields = dict(zip(self._elements, values))
+        v = fields.get('VOLT', np.nan)
+        i = fields.get('CURR', np.nan)
+        if 'VOLT' in fields and 'CURR' in fields:
+            r = v/i
+        else:
+            r = fields.get('RES', np.nan)
+        self.last_reading = Reading(float(v), float(i), float(r))
+        return self.last_reading
+
+    def _reading_field(self, field):
+        if not self.cached_readings() or self.last_reading is None:
+            self._read()
+        return getattr(self.last_reading, field)
+
+    def start_stream(self, interval=0, size=100000, converter=None, measure=None):
+        """
+        Continuously measure in a background thread into self.stream, a
+        RingBuffer of (time, resistance, temp) rows.
+
+        measure() gives the resistance (default: resistance_reversal if it
+        is configured, else resistance); converter(resistance) gives the
+        temperature, e.g. interpolate_temp (nan if None). interval is the
+        pause between readings in seconds.
+        """
+        self.stop_stream()
+        if measure is None:
+            measure = (self.resistance_reversal if self._reversal is not None
+                       else self.resistance)
+        self.stream = RingBuffer(size, ('time', 'resistance', 'temp'))
+        self._stream_stop.clear()
+        self._stream_thread = threading.Thread(
+            target=self._stream, args=(interval, converter, measure),
+            name='{}-stream'.format(self.name), daemon=True)
+        self._stream_thread.start()
+
+    def _stream(self, interval, converter, measure):
+        while not self._stream_stop.is_set():
+            try:
+                r = measure()
+            except Exception:
+                log.exception('Keithley stream reading failed')
+                self._stream_stop.wait(max(interval, 1))
+                continue
+            temp = converter(r) if converter is not None else np.nan
+            self.stream.append((time.time(), r, temp))
+            self._stream_stop.wait(interval)
+
+    def stop_stream(self):
+        if self._stream_thread is not None:
+            self._stream_stop.set()
+            self._stream_thread.join()
+            self._stream_thread = None
+
+    def is_streaming(self):
+        return self._stream_thread is not None and self._stream_thread.is_alive()
+
+    def latest_temperature(self, window=None, timeout=0):
+        """
+        Latest streamed temperature, or its mean over 'window' seconds.
+        Waits up to timeout seconds for the first sample of a running
+        stream; None if there is none.
+        """
+        deadline = time.monotonic() + timeout
+        while (self.stream is None or not len(self.stream)) and \
+                self.is_streaming() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        if self.stream is None or not len(self.stream):
+            return None
+        if window:
+            return float(self.stream.mean(window)[2])
+        return float(self.stream.latest()[2])
 
     def _set_mode_and_sense(self, msg):
         # This helps set the correct read out curr/volt
@@ -92,15 +300,6 @@ class Keithley_2400(VisaInstrument):
            
     def reset(self):
         self.write(':*RST')
-
-    def _volt_parser(self, msg):
-        MerlinSmiler = [float(x) for x in msg.split(',')]
-        return MerlinSmiler[0]
-
-    def _curr_parser(self, msg):
-        MerlinSmilerIkke = [float(x) for x in msg.split(',')]
-        return MerlinSmilerIkke[1]
-
-    def _resistance_parser(self, msg):
-        JohanSmiler = [float(x) for x in msg.split(',')]
-        return JohanSmiler[0]/JohanSmiler[1]
+        self._elements = _ELEMENTS
+        self._binary = False
+        self._reversal = None
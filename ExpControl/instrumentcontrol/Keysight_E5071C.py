@@ -1,10 +1,118 @@
 from qcodes import VisaInstrument
 from qcodes.utils import validators as vals
 from cmath import phase
+import sys
+import time
+from collections.abc import Sequence
+from functools import lru_cache
 import numpy as np
+from pyvisa.errors import VisaIOError
+from pyvisa.constants import VI_ERROR_TMO
 from qcodes import MultiParameter, Parameter
 
 
+def segment_frequencies(segments):
+    """Frequencies swept by a segment table, in sweep order."""
+    return np.concatenate([np.linspace(seg[0], seg[1], num=int(seg[2]))
+                           for seg in segments])
+
+
+class SweepSetpoints(Sequence):
+    """
+    Hashable description of the frequency setpoints of a sweep, either a
+    linear start/stop/npts sweep or a segment table.
+
+    Only expands to a (read only) numpy array when the values are used, and
+    keeps it, so reconfiguring a sweep does not build the frequency list.
+    Use sweep_setpoints() to share one instance (and its array) between the
+    trace parameters.
+    """
+    def __init__(self, start, stop, npts, segments=None):
+        if segments:
+            segments = tuple(tuple(seg) for seg in segments)
+            start, stop = segments[0][0], segments[-1][1]
+            npts = sum(int(seg[2]) for seg in segments)
+        self.start = start
+        self.stop = stop
+        self.npts = int(npts)
+        self.segments = segments or None
+        self._array = None
+
+    @property
+    def array(self):
+        if self._array is None:
+            if self.segments:
+                f = segment_frequencies(self.segments)
+            else:
+                f = np.linspace(int(self.start), int(self.stop),
+                                num=self.npts)
+            f.flags.writeable = False
+            self._array = f
+        return self._array
+
+    def _key(self):
+        return (self.start, self.stop, self.npts, self.segments)
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __eq__(self, other):
+        if isinstance(other, SweepSetpoints):
+            return self._key() == other._key()
+        return NotImplemented
+
+    def __len__(self):
+        return self.npts
+
+    def __getitem__(self, i):
+        return self.array[i]
+
+    def __iter__(self):
+        return iter(self.array)
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is not None:
+            return self.array.astype(dtype)
+        return self.array.copy() if copy else self.array
+
+    def __repr__(self):
+        if self.segments:
+            return 'SweepSetpoints({} segments, npts={})'.format(
+                len(self.segments), self.npts)
+        return 'SweepSetpoints(start={}, stop={}, npts={})'.format(
+            self.start, self.stop, self.npts)
+
+
+@lru_cache(maxsize=8)
+def sweep_setpoints(start, stop, npts, segments=None):
+    return SweepSetpoints(start, stop, npts, segments)
+
+
+def resonance_segments(start, stop, centres, width, npts_dense=201,
+                       npts_sparse=21, ifbw=None, power=None):
+    """
+    Build a segment table that sweeps [start, stop] sparsely, with dense
+    segments of full width 'width' around each frequency in 'centres'.
+
+    Segments are (start, stop, npts, ifbw, power) tuples, ifbw/power of None
+    use the channel setting. The dense segments take ifbw/power if given.
+    """
+    segments = []
+    f = start
+    for fc in sorted(centres):
+        lo = max(fc - width/2, f)
+        hi = min(fc + width/2, stop)
+        if hi <= lo:
+            continue
+        if lo > f:
+            segments.append((f, lo, npts_sparse, None, None))
+        segments.append((lo, hi, npts_dense, ifbw, power))
+        f = hi
+    if f < stop:
+        segments.append((f, stop, npts_sparse, None, None))
+    return segments
+
+
 class FrequencySweep(MultiParameter):
     """
     Hardware controlled parameter class for Rohde Schwarz RSZNB20 trace.
@@ -23,32 +131,81 @@ class FrequencySweep(MultiParameter):
         self.units = ('dB', 'deg')
         self.setpoint_names = (('frequency',), ('frequency',))
 
-    def set_sweep(self, start, stop, npts):
+    def set_sweep(self, start, stop, npts, segments=None):
         #  needed to update config of the software parameter on sweep chage
-        # freq setpoints tuple as needs to be hashable for look up
-        f = tuple(np.linspace(int(start), int(stop), num=npts))
+        # freq setpoints need to be hashable for look up; SweepSetpoints is
+        # and only builds the array when it is used
+        f = sweep_setpoints(start, stop, npts, segments)
         self.setpoints = ((f,), (f,))
-        self.shapes = ((npts,), (npts,))
+        self.shapes = ((len(f),), (len(f),))
 
     def get(self):
-        self._instrument.cont_meas_off()
-        self._instrument.write('FORM:DATA ASC')
-        self._instrument.write('SENS1:AVER ON')
-        self._instrument.write('SENS1:AVER:CLE')
-
-        # instrument averages over its last 'avg' number of sweeps
-        # need to ensure averaged result is returned
-        for avgcount in range(self._instrument.avg()):
-            self._instrument.write(':TRIG:SING; *WAI')
+        self._instrument.acquire()
+        data = self.fetch()
+        self._instrument.cont_meas_on()
+        return data
+
+    def fetch(self):
+        # read the last completed sweep, see Keysight_E5071C.arm(). The
+        # trigger source is left alone so the caller can re-arm.
         self._instrument.write('CALC1:PAR1:SEL')
-        mag_str = self._instrument.ask('CALC1:DATA:FDATA?').split(',')[::2] 
-        mag_list = [float(v) for v in mag_str]
+        mag = self._instrument.fetch_data('CALC1:DATA:FDATA?')[::2]
         self._instrument.write('CALC1:PAR2:SEL') #CALC2 does PORT2!
-        phas_str = self._instrument.ask('CALC1:DATA:FDATA?').split(',')[::2]
-        phas_list = [float(v) for v in phas_str]
-        
+        phas = self._instrument.fetch_data('CALC1:DATA:FDATA?')[::2]
+        return mag, phas
+
+
+class SParameterSweep(MultiParameter):
+    """
+    Hardware controlled parameter class for the complex S parameter trace.
+
+    Reads the corrected complex data (SDATA) of trace 1 in a single query and
+    derives magnitude, phase and unwrapped phase locally. The complex array is
+    returned as the last element so I/Q fitting (e.g. scraps) gets the raw
+    data.
+
+    mag_unit selects 'dB' (20 log10|S|) or 'lin' (|S|) for the magnitude.
+    """
+    def __init__(self, name, instrument, start, stop, npts, mag_unit='dB'):
+        super().__init__(name, names=("", "", "", ""),
+                         shapes=((), (), (), ()))
+        self._instrument = instrument
+        self.set_sweep(start, stop, npts)
+        self.names = ('magnitude', 'phase', 'unwrapped_phase', 'sdata')
+        self.setpoint_names = (('frequency',),) * 4
+        self.set_mag_unit(mag_unit)
+
+    def set_mag_unit(self, mag_unit):
+        if mag_unit not in ('dB', 'lin'):
+            raise ValueError('mag_unit must be \'dB\' or \'lin\'')
+        self.mag_unit = mag_unit
+        self.units = (mag_unit if mag_unit == 'dB' else '', 'deg', 'deg', '')
+
+    def set_sweep(self, start, stop, npts, segments=None):
+        f = sweep_setpoints(start, stop, npts, segments)
+        self.setpoints = ((f,),) * 4
+        self.shapes = ((len(f),),) * 4
+
+    def get(self):
+        self._instrument.acquire()
+        data = self.fetch()
         self._instrument.cont_meas_on()
-        return np.array(mag_list), np.array(phas_list)
+        return data
+
+    def fetch(self):
+        # read the last completed sweep, see Keysight_E5071C.arm(). The
+        # trigger source is left alone so the caller can re-arm.
+        self._instrument.write('CALC1:PAR1:SEL')
+        data = self._instrument.fetch_data('CALC1:DATA:SDATA?')
+
+        # interleaved re,im pairs -> complex128 without copying
+        s = np.ascontiguousarray(data, dtype=np.float64).view(np.complex128)
+        if self.mag_unit == 'dB':
+            mag = 20*np.log10(np.abs(s))
+        else:
+            mag = np.abs(s)
+        rad = np.angle(s)
+        return mag, np.degrees(rad), np.degrees(np.unwrap(rad)), s
 
 
 class Keysight_E5071C(VisaInstrument):
@@ -63,15 +220,28 @@ class Keysight_E5071C(VisaInstrument):
     - S11/S12 ... selection
     - set correct timeout
     """
-    def __init__(self, name, address, **kwargs):
+    def __init__(self, name, address, reset=True, **kwargs):
+        # reset=False attaches to the VNA as it is (no *RST/initialise) and
+        # only reads its current state back, see resync()
 
         super().__init__(name=name, address=address, **kwargs)
 
+        self._data_format = 'ASC'
+        self._big_endian = True # FORM:BORD NORM, the preset
+        self._done_bit = 32 # status byte bit flagging the armed sweep done
+        self._segments = None # segment table when SWE:TYPE SEGM
+
+        # Write-through cache of the channel 1 sweep state. Keys in _dirty
+        # are not trusted (e.g. after *RST) and are read back on next use.
+        self._state = {}
+        self._dirty = set()
+        self._read_state()
+
         self.add_parameter(name='power',
                            label='Power',
                            unit='dBm',
                            get_cmd='SOUR:POW?',
-                           set_cmd='SOUR:POW {:.4f}',
+                           set_cmd=self._cached_setter('power', 'SOUR:POW {:.4f}'),
                            get_parser=float,
                            vals=vals.Numbers(-150, 10))
 
@@ -79,7 +249,7 @@ class Keysight_E5071C(VisaInstrument):
                            label='Bandwidth',
                            unit='Hz',
                            get_cmd='SENS:BAND?',
-                           set_cmd='SENS:BAND {:.4f}',
+                           set_cmd=self._cached_setter('bandwidth', 'SENS:BAND {:.4f}'),
                            get_parser=int,
                            vals=vals.Numbers(1, 1e6))
 
@@ -87,7 +257,7 @@ class Keysight_E5071C(VisaInstrument):
                            label='Averages',
                            unit='',
                            get_cmd='SENS:AVER:COUN?',
-                           set_cmd='SENS:AVER:COUN {:.4f}',
+                           set_cmd=self._cached_setter('avg', 'SENS:AVER:COUN {:.4f}'),
                            get_parser=int,
                            vals=vals.Numbers(1, 999))
 
@@ -116,11 +286,23 @@ class Keysight_E5071C(VisaInstrument):
                            set_cmd=self._set_npts,
                            get_parser=int)
 
+        self.add_parameter(name='data_format',
+                           label='Trace transfer format',
+                           get_cmd='FORM:DATA?',
+                           set_cmd=self._set_data_format,
+                           vals=vals.Enum('ASC', 'REAL', 'REAL32'))
+
         self.add_parameter(name='trace',
-                           start=self.start(),
-                           stop=self.stop(),
-                           npts=self.npts(),
+                           start=self._cached('start'),
+                           stop=self._cached('stop'),
+                           npts=self._cached('npts'),
                            parameter_class=FrequencySweep)
+
+        self.add_parameter(name='sparam',
+                           start=self._cached('start'),
+                           stop=self._cached('stop'),
+                           npts=self._cached('npts'),
+                           parameter_class=SParameterSweep)
                            
         self.add_parameter('measure',
                            get_cmd='CALC:PAR:DEF?',
@@ -152,7 +334,7 @@ class Keysight_E5071C(VisaInstrument):
                            set_cmd=self._set_format4,
                            label='Trace ch2  format')
 
-        self.add_function('reset', call_cmd='*RST')
+        self.add_function('reset', call_cmd=self._reset)
         #self.add_function('tooltip_on', call_cmd='SYST:ERR:DISP ON')
         #self.add_function('tooltip_off', call_cmd='SYST:ERR:DISP OFF')
         self.add_function('cont_meas_on', call_cmd='TRIG:SOUR INT')
@@ -163,7 +345,10 @@ class Keysight_E5071C(VisaInstrument):
         self.add_function('rf_off', call_cmd='OUTP OFF')
         self.add_function('rf_on', call_cmd='OUTP ON')
 
-        self.initialise()
+        if reset:
+            self.initialise()
+        else:
+            self._apply_state() # state was read above
         self.connect_message()
         
     def _set_measure(self, val):
@@ -183,37 +368,358 @@ class Keysight_E5071C(VisaInstrument):
     def _set_format4(self,val):
        self.write('CALC:FORM {}'.format(val))
 
+    def _set_data_format(self, val):
+        # REAL is 64 bit IEEE, REAL32 is 32 bit IEEE. Binary blocks are sent
+        # in the host byte order so they can be decoded without a swap.
+        if val != 'ASC':
+            self.write('FORM:BORD {}'.format(
+                'SWAP' if sys.byteorder == 'little' else 'NORM'))
+            self._big_endian = sys.byteorder == 'big'
+        self.write('FORM:DATA {}'.format(val))
+        self._data_format = val
+
+    def fetch_data(self, cmd):
+        """
+        Query a trace data command (e.g. 'CALC1:DATA:FDATA?') and return the
+        values as a flat numpy array, using the current transfer format.
+
+        ASCII responses are parsed in one numpy call; binary responses are
+        read as an IEEE definite length block straight into the array.
+        """
+        if self._data_format == 'ASC':
+            return np.array(self.ask(cmd).split(','), dtype=float)
+
+        datatype = 'd' if self._data_format == 'REAL' else 'f'
+        # copy: the block is wrapped read-only by np.frombuffer
+        return self.visa_handle.query_binary_values(
+            cmd, datatype=datatype,
+            is_big_endian=self._big_endian,
+            container=np.array).copy()
+
+    def arm(self):
+        """
+        Start a fresh (averaged) sweep and return immediately.
+
+        The trigger is held on the bus and the instrument's average trigger
+        is used, so a single trigger runs all 'avg' sweeps on the VNA. *OPC
+        sets the ESB bit of the status byte once the averaged sweep is done;
+        use is_complete()/wait() and then trace.fetch() or sparam.fetch().
+        Call cont_meas_on() afterwards to return to free running.
+        """
+        self.cont_meas_off()
+        self.write('SENS1:AVER ON')
+        self.write('SENS1:AVER:CLE')
+        self.write('TRIG:AVER ON')
+        self.write('*CLS')
+        self.write('*ESE 1') # OPC -> ESB (bit 5) of the status byte
+        self.write('*SRE 32') # ... and ESB -> SRQ
+        self.write(':TRIG:SING')
+        self.write('*OPC')
+        self._done_bit = 32
+
+    def arm_external(self, delay=0):
+        """
+        Wait for one sweep started by the rear panel external trigger input,
+        e.g. the trigger out of a current source stepping through a program.
+
+        delay (s) is applied between the trigger edge and the sweep so the
+        source can settle. Use is_complete()/wait() as for arm(); fetch the
+        data and call arm_external() again before the next trigger, and
+        external_trigger_off() when done.
+
+        INIT1 is a sequential command, so *OPC would be set at once. The end
+        of the triggered sweep is the falling edge of the Operation status
+        'measuring' bit (16) instead, reported as OSB (bit 7) of the status
+        byte.
+        """
+        self.write('TRIG:SOUR EXT')
+        self.write('TRIG:EXT:DEL {:.6f}'.format(delay))
+        self.write('INIT1:CONT OFF')
+        self.write('SENS1:AVER ON')
+        self.write('SENS1:AVER:CLE')
+        self.write('TRIG:AVER ON')
+        self.write('*CLS')
+        self.write('STAT:OPER:PTR 0')
+        self.write('STAT:OPER:NTR 16') # measuring 1 -> 0: sweep done
+        self.write('STAT:OPER:ENAB 16') # -> OSB (bit 7) of the status byte
+        self.write('*SRE 128') # ... and OSB -> SRQ
+        self._done_bit = 128
+        self.write('INIT1') # trigger wait for a single (averaged) sweep
+
+    def external_trigger_off(self):
+        self.write('STAT:OPER:ENAB 0')
+        self.write('INIT1:CONT ON')
+        self.cont_meas_on()
+        self._done_bit = 32
+
+    def is_complete(self):
+        """
+        Serial poll the status byte; True once the armed sweep is done (ESB
+        after arm(), OSB after arm_external()).
+        """
+        return bool(self.visa_handle.read_stb() & self._done_bit)
+
+    def wait(self, timeout=None, poll_interval=0.05, callback=None):
+        """
+        Block until the armed sweep has completed.
+
+        callback() is called between polls so other instruments can be
+        serviced while the VNA sweeps. If the VISA session supports service
+        requests and no callback is given, waits on SRQ instead of polling.
+        timeout is in seconds, None for sweep_timeout(); TimeoutError is
+        raised when it runs out.
+        """
+        if timeout is None:
+            timeout = self.sweep_timeout()
+        if callback is None and hasattr(self.visa_handle, 'wait_for_srq'):
+            tmo = int(timeout*1e3)
+            try:
+                self.visa_handle.wait_for_srq(tmo)
+            except VisaIOError as e:
+                if e.error_code != VI_ERROR_TMO:
+                    raise
+                raise TimeoutError('VNA sweep did not complete within '
+                                   '{:.1f} s'.format(timeout)) from e
+            # serial poll clears the SRQ for the next sweep
+            self.visa_handle.read_stb()
+            self._clear_done()
+            return
+
+        t0 = time.monotonic()
+        while not self.is_complete():
+            if time.monotonic() - t0 > timeout:
+                raise TimeoutError('VNA sweep did not complete within '
+                                   '{:.1f} s'.format(timeout))
+            if callback is not None:
+                callback()
+            time.sleep(poll_interval)
+        self._clear_done()
+
+    def _clear_done(self):
+        # OSB stays set until the Operation event register is read
+        if self._done_bit == 128:
+            self.ask('STAT:OPER:EVEN?')
+
+    def acquire(self, timeout=None, callback=None):
+        """
+        Take a fresh (averaged) sweep with the trigger held on the bus, ready
+        for the trace data to be fetched. Call cont_meas_on() afterwards.
+        """
+        if timeout is None:
+            timeout = self.sweep_timeout()
+        self.arm()
+        self.wait(timeout=timeout, callback=callback)
+
+    def sweep_timeout(self, factor=5):
+        """
+        Default wait (s) for an armed sweep: factor times the expected time
+        of the averaged sweep, and never less than the VISA timeout.
+        """
+        sweep = float(self.ask('SENS1:SWE:TIME?'))*self._cached('avg')
+        return max(factor*sweep + 1, self.timeout() or 0)
+
+    def _update_sweep(self, start, stop, npts):
+        # update setpoints for the FrequencySweep/SParameterSweep params.
+        # In a segmented sweep the linear start/stop/npts are not used.
+        if self._segments:
+            return
+        self.trace.set_sweep(start, stop, npts)
+        self.sparam.set_sweep(start, stop, npts)
+
+    def set_segments(self, segments):
+        """
+        Switch channel 1 to a segmented sweep.
+
+        segments is a list of (start, stop, npts) or
+        (start, stop, npts, ifbw, power) tuples in ascending frequency, see
+        resonance_segments(). Per segment IF bandwidth/power are only sent if
+        any segment sets them; None falls back to the channel value.
+        """
+        segments = [tuple(seg) + (None,)*(5-len(seg)) for seg in segments]
+        use_ifbw = any(seg[3] is not None for seg in segments)
+        use_pow = any(seg[4] is not None for seg in segments)
+        ifbw0 = self._cached('bandwidth') if use_ifbw else None
+        pow0 = self._cached('power') if use_pow else None
+
+        # 5: buffer format, 0: start/stop, ifbw on/off, power on/off,
+        # delay off, sweep time off, number of segments, then the segments
+        buf = [5, 0, int(use_ifbw), int(use_pow), 0, 0, len(segments)]
+        for start, stop, npts, ifbw, power in segments:
+            buf += [start, stop, int(npts)]
+            if use_ifbw:
+                buf.append(ifbw0 if ifbw is None else ifbw)
+            if use_pow:
+                buf.append(pow0 if power is None else power)
+
+        self.write('SENS1:SEGM:DATA {}'.format(','.join(str(v) for v in buf)))
+        self.write('SENS1:SWE:TYPE SEGM')
+        self._segments = tuple(segments)
+        self.trace.set_sweep(None, None, None, segments=self._segments)
+        self.sparam.set_sweep(None, None, None, segments=self._segments)
+
+    def linear_sweep(self):
+        """Return channel 1 to the linear start/stop/npts sweep."""
+        self.write('SENS1:SWE:TYPE LIN')
+        self._segments = None
+        self._update_sweep(self._cached('start'), self._cached('stop'),
+                           self._cached('npts'))
+
+    def is_segmented(self):
+        return bool(self._segments)
+
+    def frequencies(self):
+        """Frequency setpoints of the current sweep as a (writable) numpy array."""
+        return self.trace.setpoints[0][0].array.copy()
+
+    def _cached_setter(self, key, cmd):
+        def setter(val):
+            self.write(cmd.format(val))
+            self._store(key, val)
+        return setter
+
+    def _store(self, key, val):
+        self._state[key] = val
+        self._dirty.discard(key)
+
+    def _cached(self, key):
+        # cached sweep state, read back from the instrument when unknown
+        if key in self._dirty or key not in self._state:
+            self._store(key, self.parameters[key].get())
+        return self._state[key]
+
+    def setting(self, key):
+        """
+        Current value of start, stop, npts, bandwidth, power, avg or
+        data_format from the driver's cache, queried only when unknown.
+        """
+        if key == 'data_format':
+            return self._data_format
+        return self._cached(key)
+
+    def _invalidate(self):
+        self._dirty.update(self._state)
+
+    def _reset(self):
+        # read the preset back so the segment table, transfer format and
+        # byte order of the old setup don't outlive *RST
+        self.write('*RST')
+        self.resync()
+
+    def _read_state(self):
+        # one batched query for the whole cached state
+        resp = self.ask('SENS1:FREQ:STAR?;:SENS1:FREQ:STOP?;'
+                        ':SENS1:SWE:POIN?;:SENS1:BAND?;:SOUR1:POW?;'
+                        ':SENS1:AVER:COUN?;:FORM:DATA?;:SENS1:SWE:TYPE?;'
+                        ':FORM:BORD?')
+        values = resp.strip().split(';')
+        for key, val in zip(('start', 'stop', 'bandwidth', 'power'),
+                            (values[0], values[1], values[3], values[4])):
+            self._store(key, float(val))
+        self._store('npts', int(float(values[2])))
+        self._store('avg', int(float(values[5])))
+        self._data_format = values[6].strip().upper()
+        self._big_endian = not values[8].strip().upper().startswith('SWAP')
+        if values[7].strip().upper().startswith('SEGM'):
+            self._segments = self._parse_segments(
+                self.ask('SENS1:SEGM:DATA?'))
+        else:
+            self._segments = None
+
+    def _parse_segments(self, resp):
+        buf = [float(v) for v in resp.split(',')]
+        use_ifbw, use_pow, use_del, use_time = (int(v) for v in buf[2:6])
+        n = int(buf[6])
+        width = 3 + use_ifbw + use_pow + use_del + use_time
+        segments = []
+        for i in range(n):
+            seg = buf[7+i*width:7+(i+1)*width]
+            ifbw = seg[3] if use_ifbw else None
+            power = seg[3+use_ifbw] if use_pow else None
+            segments.append((seg[0], seg[1], int(seg[2]), ifbw, power))
+        return tuple(segments)
+
+    def resync(self):
+        """
+        Read the sweep state back from the instrument in one query and
+        replace the local cache, e.g. after changes on the front panel.
+        """
+        self._read_state()
+        self._apply_state()
+        return dict(self._state)
+
+    def _apply_state(self):
+        # point the trace parameters at the cached sweep
+        if self._segments:
+            self.trace.set_sweep(None, None, None, segments=self._segments)
+            self.sparam.set_sweep(None, None, None, segments=self._segments)
+        else:
+            self._update_sweep(self._state['start'], self._state['stop'],
+                               self._state['npts'])
+
+    def save_state(self, name):
+        """Save the complete instrument setup as state file 'name'."""
+        self.write('MMEM:STOR:STAT "{}.sta"'.format(name))
+
+    def recall_state(self, name):
+        """
+        Recall an instrument setup saved with save_state() and resync the
+        driver to it, switching configuration in one command.
+        """
+        self.write('MMEM:LOAD:STAT "{}.sta"'.format(name))
+        self.ask('*OPC?')
+        self._invalidate()
+        self.resync()
+
+    def configure(self, **settings):
+        """
+        Set any of start, stop, npts, bandwidth, power, avg, skipping those
+        already at the requested value according to the local cache.
+        """
+        for key in ('npts', 'bandwidth', 'power', 'avg', 'start', 'stop'):
+            if key not in settings:
+                continue
+            val = settings[key]
+            if (key not in self._dirty and key in self._state
+                    and self._state[key] == val):
+                continue
+            self.parameters[key].set(val)
+
     def _set_start(self, val):
         self.write('SENS:FREQ:START {:.4f}'.format(val))
-        # update setpoints for FrequencySweep param
-        self.trace.set_sweep(val, self.stop(), self.npts())
+        if val >= self._cached('stop'):
+            self._dirty.add('stop') # instrument pushes stop along
+        self._store('start', val)
+        self._update_sweep(val, self._cached('stop'), self._cached('npts'))
 
     def _set_stop(self, val):
         self.write('SENS:FREQ:STOP {:.4f}'.format(val))
-        # update setpoints for FrequencySweep param
-        self.trace.set_sweep(self.start(), val, self.npts())
+        if val <= self._cached('start'):
+            self._dirty.add('start')
+        self._store('stop', val)
+        self._update_sweep(self._cached('start'), val, self._cached('npts'))
         
     def _set_center(self, val):
         self.write('SENS:FREQ:CENTER {:.4f}'.format(val))
-        # update setpoints for FrequencySweep param
-        f1 = val-self.span()/2
-        f2 = val+self.span()/2
-        self.trace.set_sweep(f1, f2, self.npts())
+        span = self._cached('stop') - self._cached('start')
+        self._store('start', val-span/2)
+        self._store('stop', val+span/2)
+        self._update_sweep(val-span/2, val+span/2, self._cached('npts'))
         
     def _set_span(self, val):
         self.write('SENS:FREQ:SPAN {:.4f}'.format(val))
-        # update setpoints for FrequencySweep param
-        f1 = self.center()-val/2
-        f2 = self.center()+val/2
-        self.trace.set_sweep(f1, f2, self.npts())
+        center = (self._cached('start') + self._cached('stop'))/2
+        self._store('start', center-val/2)
+        self._store('stop', center+val/2)
+        self._update_sweep(center-val/2, center+val/2, self._cached('npts'))
 
     def _set_npts(self, val):
         self.write('SENS:SWE:POIN {:.4f}'.format(val))
-        # update setpoints for FrequencySweep param
-        self.trace.set_sweep(self.start(), self.stop(), val)
+        self._store('npts', val)
+        self._update_sweep(self._cached('start'), self._cached('stop'), val)
 
     def initialise(self):
-        self.write('*RST')
+        self._reset()
+        self._segments = None
         self.write('SENS1:SWE:TYPE LIN') #linear sweep SENS1?
         self.write('SENS1:SWE:TIME:AUTO ON') 
         self.write('TRIG:SOUR INT') #trig immediately when INIT:CON ON
@@ -231,6 +737,7 @@ class Keysight_E5071C(VisaInstrument):
         # self.write('CALC1:FORM '+form2) #<-----------------
         
         self.write('INIT1:CONT ON') #maybe INIT2 too?
+        self.data_format('ASC')
         self.start(1e6)
         self.stop(20e9)
         self.npts(201)
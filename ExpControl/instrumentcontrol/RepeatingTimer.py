@@ -1,30 +1,28 @@
-from threading import Timer
-import time
+from .Scheduler import PeriodicScheduler
 
 class RepeatingTimer(object):
-  def __init__(self, interval, function, *args, **kwargs):
-    self._timer = None
+  # Calls function every interval seconds on one worker thread, on a drift
+  # free monotonic schedule (see PeriodicScheduler). Late ticks are skipped
+  # rather than piling up; stats() gives jitter/duration/overrun counts.
+  def __init__(self, interval, function, *args, policy='skip', **kwargs):
     self.interval = interval
     self.function = function
     self.args = args
     self.kwargs = kwargs
     self.is_running = False
-    self.next_call = time.time()
-    self.start()
+    self._scheduler = PeriodicScheduler()
     self.function(*self.args, **self.kwargs) #Run the function immediately
-    
-  def _run(self):
-    self.is_running = False
+    self._scheduler.add('timer', interval, self.function, *args, policy=policy, run_now=False, **kwargs)
     self.start()
-    self.function(*self.args, **self.kwargs)
 
   def start(self):
     if not self.is_running:
-      self.next_call += self.interval
-      self._timer = Timer(self.next_call - time.time(), self._run)
-      self._timer.start()
+      self._scheduler.start()
       self.is_running = True
 
   def stop(self):
-    self._timer.cancel()
-    self.is_running = False
\ No newline at end of file
+    self._scheduler.stop()
+    self.is_running = False
+
+  def stats(self):
+    return self._scheduler.stats()['timer']
@@ -5,6 +5,7 @@ import matplotlib.pyplot as plt
 from .Keithley_2400 import Keithley_2400
 from interpolate_temp import interpolate_temp
 from RepeatingTimer import RepeatingTimer
+from TimeSeriesWriter import TimeSeriesWriter, read_timeseries
 from os.path import join, exists
 from os import makedirs
 import time
@@ -23,24 +24,15 @@ def setup_keithley():
     Keithley.compliancev(10e-3)
 
 def measure():
-    Keithley.curr(current)
-    Keithley.output(1)
-    res1 = Keithley.resistance()
-    Keithley.output(0)
-    Keithley.curr(-current)
-    Keithley.output(1)
-    res2 = Keithley.resistance()
-    Keithley.output(0)
-    resistance=(res1+res2)/2
-    return resistance
+    # +I/-I reversal pair, programmed by configure_reversal below
+    return Keithley.resistance_reversal()
 
 def getdata():
-    global data
     posix=time.time();
     runtime=posix-starttime;
     resistance=measure();
     temp=interpolate_temp(resistance);
-    data=np.append(data,[[runtime,posix,resistance,temp]],axis=0)
+    writer.append((runtime,posix,resistance,temp))
     print('Time: {:6.2f}s; POSIX: {:10.0f}; Resistance: {:6.2f}Ohm; Temp: {:6.3f}K'.format(runtime,posix,resistance,temp))
 
 current = 10e-6; #Amps
@@ -57,15 +49,17 @@ Keithley = Keithley_2400('K2400','GPIB0::'+gpib_address+'::INSTR')
 setup_keithley()
 Keithley.curr(current)
 Keithley.compliancev(complvoltage)
+Keithley.configure_reversal(current)
 
 # Set up data storage
-global data
-data = np.empty([0,4])#Time,Res,Temp
 filename=input('Enter a filename (optional): ')
 if not filename: filename='data'+datetime.datetime.now().replace(microsecond=0).isoformat().replace(':','-')
 folder=join('data','')
 if not exists(folder): makedirs(folder);
 fullpath=join(folder,filename+'.csv');
+# Streamed to disk every 'flush' seconds, so a crash loses at most that much
+flush = 30.0
+writer = TimeSeriesWriter(fullpath,('Time','POSIX','Resistance','Temperature'),flush_interval=flush)
 
 # Ask for time interval
 usertime = input('Enter time interval >2sec: ')
@@ -78,8 +72,9 @@ starttime=time.time();
 rt = RepeatingTimer(timeinterval,getdata) #Do not set below 2s
 input() # Wait for press enter
 rt.stop()
-np.savetxt(fullpath,data,delimiter=',',header='Time\tPOSIX\tResistance\tTemperature')
+writer.close()
 print('Data saved to '+fullpath)
+columns, data = read_timeseries(fullpath)
 
 # And a quick plot
 plt.plot(data[:,0],data[:,3])
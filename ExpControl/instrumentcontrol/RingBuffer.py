@@ -0,0 +1,55 @@
+import threading
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Fixed size, thread safe ring buffer of float rows backed by one
+    preallocated numpy array. Column 0 is taken to be a timestamp (s) for
+    the time window methods.
+
+    buf = RingBuffer(10000, ('time', 'resistance', 'temp'))
+    buf.append((t, r, T))
+    buf.latest()          # last row
+    buf.mean(60)          # column means over the last 60 s
+    """
+    def __init__(self, size, columns):
+        self.columns = tuple(columns)
+        self.size = size
+        self._data = np.full((size, len(self.columns)), np.nan)
+        self._count = 0 # total rows ever appended
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self._count, self.size)
+
+    def append(self, row):
+        with self._lock:
+            self._data[self._count % self.size] = row
+            self._count += 1
+
+    def latest(self):
+        with self._lock:
+            if not self._count:
+                return None
+            return self._data[(self._count - 1) % self.size].copy()
+
+    def data(self):
+        """All stored rows, oldest first (a copy)."""
+        with self._lock:
+            n = len(self)
+            i = self._count % self.size
+            if n < self.size:
+                return self._data[:n].copy()
+            return np.concatenate((self._data[i:], self._data[:i]))
+
+    def window(self, seconds):
+        """Rows with timestamp within 'seconds' of the newest row."""
+        d = self.data()
+        if not len(d):
+            return d
+        return d[d[:, 0] >= d[-1, 0] - seconds]
+
+    def mean(self, seconds):
+        d = self.window(seconds)
+        return d.mean(axis=0) if len(d) else None
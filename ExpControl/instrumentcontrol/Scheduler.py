@@ -0,0 +1,158 @@
+import heapq
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """
+    One task of a PeriodicScheduler, with its timing statistics.
+
+    jitter is how late a run started relative to its due time, duration how
+    long it took; overruns counts runs longer than the interval and skipped
+    the ticks dropped under the 'skip' policy.
+    """
+    def __init__(self, name, interval, function, args, kwargs, policy):
+        if policy not in ('skip', 'catch_up'):
+            raise ValueError('policy must be \'skip\' or \'catch_up\'')
+        self.name = name
+        self.interval = interval
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.policy = policy
+        self.due = None
+        self.active = True
+        self.runs = 0
+        self.skipped = 0
+        self.overruns = 0
+        self.errors = 0
+        self._jitter_sum = 0.
+        self.jitter_max = 0.
+        self._duration_sum = 0.
+        self.duration_max = 0.
+
+    def _record(self, jitter, duration):
+        self.runs += 1
+        self._jitter_sum += jitter
+        self.jitter_max = max(self.jitter_max, jitter)
+        self._duration_sum += duration
+        self.duration_max = max(self.duration_max, duration)
+        if duration > self.interval:
+            self.overruns += 1
+
+    def stats(self):
+        n = max(self.runs, 1)
+        return {'runs': self.runs, 'skipped': self.skipped,
+                'overruns': self.overruns, 'errors': self.errors,
+                'jitter_mean': self._jitter_sum/n, 'jitter_max': self.jitter_max,
+                'duration_mean': self._duration_sum/n,
+                'duration_max': self.duration_max}
+
+
+class PeriodicScheduler:
+    """
+    Runs many periodic tasks on a single worker thread.
+
+    Due times are kept on the monotonic clock as start + k*interval, so
+    there is no drift from the time the tasks themselves take. When a task
+    falls behind (its run, or another task's, took too long) the policy
+    decides what happens to the missed ticks:
+    - 'skip': drop them and continue on the original time grid
+    - 'catch_up': run them back to back until the task is on time again
+
+    sched = PeriodicScheduler()
+    sched.add('temp', 1.0, log_temperature)
+    sched.add('heartbeat', 10, beat, policy='catch_up')
+    sched.start()
+    ...
+    sched.stats()
+    sched.stop()
+    """
+    def __init__(self):
+        self._tasks = {}
+        self._heap = []
+        self._counter = 0 # tie breaker for equal due times
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def add(self, name, interval, function, *args, policy='skip', run_now=True, **kwargs):
+        task = PeriodicTask(name, interval, function, args, kwargs, policy)
+        with self._cond:
+            if name in self._tasks:
+                self._tasks[name].active = False
+            self._tasks[name] = task
+            task.due = time.monotonic() + (0 if run_now else interval)
+            self._push(task)
+            self._cond.notify()
+        return task
+
+    def remove(self, name):
+        with self._cond:
+            task = self._tasks.pop(name)
+            task.active = False
+
+    def _push(self, task):
+        self._counter += 1
+        heapq.heappush(self._heap, (task.due, self._counter, task))
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name='scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def is_running(self):
+        return self._running
+
+    def stats(self):
+        return {name: task.stats() for name, task in self._tasks.items()}
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running:
+                    while self._heap and not self._heap[0][2].active:
+                        heapq.heappop(self._heap)
+                    if self._heap:
+                        wait = self._heap[0][0] - time.monotonic()
+                        if wait <= 0:
+                            break
+                        self._cond.wait(wait)
+                    else:
+                        self._cond.wait()
+                if not self._running:
+                    return
+                due, _, task = heapq.heappop(self._heap)
+
+            start = time.monotonic()
+            try:
+                task.function(*task.args, **task.kwargs)
+            except Exception:
+                task.errors += 1
+                log.exception('Scheduled task %s failed', task.name)
+            end = time.monotonic()
+            task._record(start - due, end - start)
+
+            with self._cond:
+                if not task.active:
+                    continue
+                task.due = due + task.interval
+                if task.policy == 'skip' and task.due <= end:
+                    missed = int((end - task.due)//task.interval) + 1
+                    task.skipped += missed
+                    task.due += missed*task.interval
+                self._push(task)
@@ -0,0 +1,196 @@
+import io
+import json
+import os
+import threading
+import time
+import numpy as np
+
+_MAGIC = b'EXPCTS1\n'
+
+
+def _format(path, fmt):
+    if fmt is not None:
+        return fmt
+    ext = os.path.splitext(path)[1].lower()
+    return {'.bin': 'bin', '.h5': 'hdf5', '.hdf5': 'hdf5'}.get(ext, 'csv')
+
+
+class TimeSeriesWriter:
+    """
+    Append-only writer for long running logs (e.g. temperature during a
+    cooldown) with bounded memory.
+
+    Rows are collected in one preallocated chunk of chunk_size rows and
+    appended to the file when the chunk is full or flush_interval seconds
+    have passed, so at most one chunk is lost in a crash. The file can be
+    read (read_timeseries) or followed (tail_timeseries) while logging.
+
+    Formats, chosen from the file extension unless fmt is given:
+    - 'csv': comma separated text with a '# col1,col2,...' header
+    - 'bin': header line + JSON column list, then raw little endian float64
+    - 'hdf5': resizable 'data' dataset, in SWMR mode (needs h5py)
+
+    with TimeSeriesWriter('cooldown.csv', ('time', 'resistance', 'temp')) as w:
+        w.append((t, r, T))
+    """
+    def __init__(self, path, columns, fmt=None, chunk_size=256, flush_interval=10.0, fsync=False):
+        self.path = path
+        self.columns = tuple(columns)
+        self.fmt = _format(path, fmt)
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.rows_written = 0
+        self._chunk = np.empty((chunk_size, len(self.columns)))
+        self._n = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._open()
+
+    def _open(self):
+        exists = os.path.exists(self.path) and os.path.getsize(self.path) > 0
+        if self.fmt == 'hdf5':
+            import h5py
+            self._h5 = h5py.File(self.path, 'a', libver='latest')
+            if 'data' not in self._h5:
+                self._h5.create_dataset('data', shape=(0, len(self.columns)),
+                                        maxshape=(None, len(self.columns)),
+                                        chunks=(len(self._chunk), len(self.columns)))
+                self._h5['data'].attrs['columns'] = json.dumps(self.columns)
+            self._h5.swmr_mode = True
+            self.rows_written = self._h5['data'].shape[0]
+            return
+
+        self._fh = open(self.path, 'ab')
+        if exists:
+            return
+        if self.fmt == 'csv':
+            self._fh.write('# {}\n'.format(','.join(self.columns)).encode())
+        else:
+            self._fh.write(_MAGIC + json.dumps(self.columns).encode() + b'\n')
+        self._fh.flush()
+
+    def append(self, row):
+        with self._lock:
+            self._chunk[self._n] = row
+            self._n += 1
+            if (self._n == len(self._chunk) or
+                    time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        self._last_flush = time.monotonic()
+        if not self._n:
+            return
+        rows = self._chunk[:self._n]
+        if self.fmt == 'hdf5':
+            d = self._h5['data']
+            d.resize(d.shape[0] + self._n, axis=0)
+            d[-self._n:] = rows
+            d.flush()
+        else:
+            if self.fmt == 'csv':
+                buf = io.BytesIO()
+                np.savetxt(buf, rows, delimiter=',')
+                self._fh.write(buf.getvalue())
+            else:
+                self._fh.write(rows.astype('<f8').tobytes())
+            self._fh.flush()
+            if self.fsync:
+                os.fsync(self._fh.fileno())
+        self.rows_written += self._n
+        self._n = 0
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            if self.fmt == 'hdf5':
+                self._h5.close()
+            else:
+                self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def _bin_header(fh):
+    if fh.read(len(_MAGIC)) != _MAGIC:
+        raise ValueError('Not a TimeSeriesWriter binary file')
+    columns = tuple(json.loads(fh.readline().decode()))
+    return columns, fh.tell()
+
+
+def read_timeseries(path, fmt=None):
+    """Return (columns, rows) of a file written by TimeSeriesWriter."""
+    fmt = _format(path, fmt)
+    if fmt == 'hdf5':
+        import h5py
+        with h5py.File(path, 'r', libver='latest', swmr=True) as f:
+            return tuple(json.loads(f['data'].attrs['columns'])), f['data'][()]
+    if fmt == 'bin':
+        with open(path, 'rb') as fh:
+            columns, offset = _bin_header(fh)
+        data = np.fromfile(path, dtype='<f8', offset=offset)
+        n = len(data)//len(columns) # ignore a partly written row
+        return columns, data[:n*len(columns)].reshape(n, len(columns))
+    with open(path) as fh:
+        columns = tuple(fh.readline().lstrip('#').strip().split(','))
+    data = np.loadtxt(path, delimiter=',', comments='#', ndmin=2)
+    return columns, data
+
+
+def tail_timeseries(path, poll_interval=1.0, stop=None, fmt=None):
+    """
+    Follow a csv/bin/hdf5 file while it is being written, yielding arrays
+    of the new complete rows. Stops when stop() returns True (never if
+    None).
+    """
+    fmt = _format(path, fmt)
+    if fmt == 'hdf5':
+        yield from _tail_hdf5(path, poll_interval, stop)
+        return
+    with open(path, 'rb') as fh:
+        if fmt == 'bin':
+            columns, offset = _bin_header(fh)
+            rowbytes = 8*len(columns)
+        else:
+            columns = tuple(fh.readline().decode().lstrip('#').strip().split(','))
+        pending = b''
+        while stop is None or not stop():
+            pending += fh.read()
+            if fmt == 'bin':
+                n = len(pending)//rowbytes
+                chunk, pending = pending[:n*rowbytes], pending[n*rowbytes:]
+                rows = np.frombuffer(chunk, dtype='<f8').reshape(n, len(columns))
+            else:
+                end = pending.rfind(b'\n') + 1
+                chunk, pending = pending[:end], pending[end:]
+                rows = (np.loadtxt(io.BytesIO(chunk), delimiter=',', ndmin=2)
+                        if chunk.strip() else np.empty((0, len(columns))))
+            if len(rows):
+                yield rows
+            else:
+                time.sleep(poll_interval)
+
+
+def _tail_hdf5(path, poll_interval, stop):
+    # SWMR reader: refresh() picks up the rows the writer has flushed since
+    import h5py
+    with h5py.File(path, 'r', libver='latest', swmr=True) as f:
+        d = f['data']
+        seen = 0
+        while stop is None or not stop():
+            d.refresh()
+            n = d.shape[0]
+            if n > seen:
+                rows, seen = d[seen:n], n
+                yield rows
+            else:
+                time.sleep(poll_interval)
@@ -1,4 +1,9 @@
 from .instrumentcontrol import InstrumentControl
-from .Keithley_2400 import Keithley_2400
-from .Keysight_E5071C import Keysight_E5071C
+from .Keithley_2400 import Keithley_2400, Reading
+from .Keysight_E5071C import Keysight_E5071C, resonance_segments
 from .RotatingStage import RotatingStage
+from .Bruker_ER032M import Bruker_ER032M
+from .RingBuffer import RingBuffer
+from .thermometry import CalibrationRegistry, SensorCalibration
+from .Scheduler import PeriodicScheduler
+from .TimeSeriesWriter import TimeSeriesWriter, read_timeseries, tail_timeseries
@@ -1,9 +1,10 @@
 import qcodes as qc
 #from qcodes.instrument_drivers.Keysight.Keysight_E5071C import Keysight_E5071C
-from qcodes.instrument_drivers.Keysight.Keysight_E5071C import Keysight_E5071C
+from .Keysight_E5071C import Keysight_E5071C
 from qcodes.instrument_drivers.yokogawa.GS200 import GS200
 from .Keithley_2400 import Keithley_2400
 from .RotatingStage import RotatingStage
+from .Bruker_ER032M import Bruker_ER032M
 import pyvisa
 import visa
 
@@ -11,8 +12,9 @@ class InstrumentControl:
     def __init__(self):
         return
     
-    def connect_to_vna(self,vna_address='169.254.71.72'):
-        self.__vna = Keysight_E5071C('VNA','TCPIP0::'+vna_address+'::INSTR')
+    def connect_to_vna(self,vna_address='169.254.71.72',reset=True):
+        # reset=False attaches without *RST, keeping the VNA setup
+        self.__vna = Keysight_E5071C('VNA','TCPIP0::'+vna_address+'::INSTR',reset=reset)
         return self.__vna
     
     def connect_to_gs200(self):
@@ -24,23 +26,14 @@ class InstrumentControl:
         return self.__keithley
     
     def connect_to_er032m(self,com='COM21'):
-        rm = pyvisa.ResourceManager()
-        self.__prx = rm.open_resource('COM21')
-        print('Connnected to:    Bruker ER 032M')
-        self.__prx.write('++mode 1') # Controller
-        self.__prx.write('++auto 0') # listen
-        self.__prx.write('++addr '+'ASRL2')
-        self.__prx.write('++addr')
-        self.__prx.write('++eos 0') # CR/LF
-        self.__prx.write('++eoi 1') # Enable EOI assertion
-        self.__prx.write('++read eoi')
-        self.__prx.write('CF+0.00')
-        self.__prx.close()    
+        self.__prx = Bruker_ER032M('er032m', com, field_cal=self.field_cal(1))
+        self.__prx.cf(0)
         return self.__prx
        
     def connect_to_rotating_stage(self):       
         serial_address = 'ASRL23::INSTR'
         self.__stage = RotatingStage('stage',serial_address)
+        return self.__stage
         
     def fast_rotation(self,global_step=0,steps=0,direction='left'):
         rot_direction = 'direction'  # Right = clockwise viewed from above; left = counter clockwise
@@ -67,13 +60,14 @@ class InstrumentControl:
     #    self.__vna.set('format2',format2)
     #    self.__vna.timeout.set(5000)
     
-    def setup_vna(self,power=-30,avgs=1,measure='S21',format1='MLOG',format2='PHAS',format3='PHAS',format4='PHAS'):
+    def setup_vna(self,power=-30,avgs=1,measure='S21',data_format='ASC',format1='MLOG',format2='PHAS',format3='PHAS',format4='PHAS'):
         #power = -30
         #avgs = 1
 
         self.__vna.set('power', power)
         self.__vna.set('avg', avgs)
         self.__vna.set('measure', measure)
+        self.__vna.set('data_format', data_format) # 'REAL'/'REAL32' for binary transfer
         #self.__vna.set('format1',format1)
         #self.__vna.set('format2',format2)
         #self.__vna.set('format2',format3)
@@ -88,7 +82,7 @@ class InstrumentControl:
         self.__keithley.write(':SENS:RES:NPLC 10') #Slow speed, high accuracy
         self.__keithley.write(':SYST:RSEN ON') #4-wire
         self.__keithley.write(':SYST:BEEP:STAT 0') #Turn off annoying beeping
-        #self.__keithley.write(':FORM:ELEM RES')
+        self.__keithley.read_format(('VOLT','CURR')) # R = V/I, no TIME/STAT
         self.__keithley.curr(10e-6) #For safety set low current suring setup
         self.__keithley.compliancev(10e-3)
 
@@ -97,10 +91,26 @@ class InstrumentControl:
         return field_gauss*cal # in Gauss
     
     def set_zero_field(self):
-        self.__prx.open()
-        self.__prx.write('CF+102.10') # Zero point is 102.10 Gauss
-        self.__prx.close()
+        self.__prx.zero() # Zero point is 102.10 Gauss
           
+    def load_gs200_program(self,currents,interval=1.0,slope=0):
+        # Load a list of current levels into the GS200 program memory.
+        # Running it steps through them every 'interval' seconds with a
+        # pulse on the rear BNC trigger output at each step.
+        gs = self.__gs
+        gs.write(':SOUR:FUNC CURR')
+        gs.write(':PROG:EDIT:STAR')
+        for current in currents:
+            gs.write(':SOUR:LEV {:.8e}'.format(current))
+        gs.write(':PROG:EDIT:END')
+        gs.write(':PROG:REP 0')
+        gs.write(':PROG:INT {:.3f}'.format(interval))
+        gs.write(':PROG:SLOP {:.3f}'.format(slope))
+        gs.write(':ROUT:BNCO TRIG')
+
+    def run_gs200_program(self):
+        self.__gs.write(':PROG:RUN')
+
     def set_zero_current(self,out='off'):
         self.__gs.current(0)
         self.set_current_source_output(out=out)
@@ -1,4 +1,6 @@
+import io
 import numpy as np
+from ExpControl.instrumentcontrol.thermometry import registry
 
 #Temperature             Resistance
 #(Kelvin)                (Ohms)
@@ -87,8 +89,14 @@ calstr='''1.19599749183145E+00   5.52349489299153E+02
 3.26023446864110E+02   3.53061913429278E+01
 3.30027253337849E+02   3.50638339696913E+01'''
 
-# Parse to 2D array and invert so resistance is increasing
-calibration = np.fromstring(calstr, sep='   ').reshape(-1, 2)[::-1]
+# Parsed on first use, not at import
+def _default_calibration():
+    calibration = np.loadtxt(io.StringIO(calstr))
+    return calibration[:,0], calibration[:,1], 'linear'
 
-def interpolate_temp(resistance):
-    return np.interp(resistance,calibration[:,1],calibration[:,0])
\ No newline at end of file
+registry.register_lazy('default', _default_calibration)
+
+def interpolate_temp(resistance, sensor='default'):
+    # works on scalars and whole arrays; other sensors are added with
+    # registry.load(name, file, method=...)
+    return registry.convert(sensor, resistance)
\ No newline at end of file
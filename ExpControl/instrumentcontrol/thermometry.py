@@ -0,0 +1,114 @@
+import os
+import hashlib
+import numpy as np
+
+
+class SensorCalibration:
+    """
+    Resistance -> temperature conversion for one thermometer.
+
+    method:
+    - 'linear': piecewise linear in R, T (np.interp)
+    - 'loglog': piecewise linear in log R, log T
+    - 'chebyshev': Chebyshev fit of log T against log R, of degree 'degree'
+    - 'spline': cubic spline of log T against log R (needs scipy)
+
+    Resistances outside the calibrated range are clamped to it. Calling the
+    object converts a scalar or a whole array in one vectorised call.
+    """
+    METHODS = ('linear', 'loglog', 'chebyshev', 'spline')
+
+    def __init__(self, name, temperature, resistance, method='linear', degree=9):
+        if method not in self.METHODS:
+            raise ValueError('method must be one of {}'.format(self.METHODS))
+        order = np.argsort(resistance) # np.interp needs increasing R
+        self.name = name
+        self.method = method
+        self.temperature = np.asarray(temperature, dtype=float)[order]
+        self.resistance = np.asarray(resistance, dtype=float)[order]
+        self._logr = np.log(self.resistance)
+        self._logt = np.log(self.temperature)
+
+        if method == 'chebyshev':
+            self._fit = np.polynomial.Chebyshev.fit(self._logr, self._logt, degree)
+        elif method == 'spline':
+            from scipy.interpolate import CubicSpline
+            self._fit = CubicSpline(self._logr, self._logt)
+
+    def __call__(self, resistance):
+        r = np.clip(resistance, self.resistance[0], self.resistance[-1])
+        if self.method == 'linear':
+            return np.interp(r, self.resistance, self.temperature)
+        if self.method == 'loglog':
+            return np.exp(np.interp(np.log(r), self._logr, self._logt))
+        return np.exp(self._fit(np.log(r)))
+
+
+class CalibrationRegistry:
+    """
+    Named thermometer calibrations.
+
+    Calibration files are two column text (temperature, resistance), as
+    exported by the sensor manufacturer. They are parsed once and cached as
+    .npz next to each other in cache_dir, keyed on the file path and its
+    modification time, so later sessions load the binary copy.
+
+    registry.load('RuOx_A', 'RuOx_A.dat', method='loglog')
+    registry.convert('RuOx_A', resistances)
+    """
+    def __init__(self, cache_dir=None):
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.expanduser('~'), '.expcontrol', 'calibrations')
+        self.cache_dir = cache_dir
+        self._sensors = {}
+        self._lazy = {} # name -> callable registering the sensor on first use
+
+    def names(self):
+        return sorted(set(self._sensors) | set(self._lazy))
+
+    def register(self, name, temperature, resistance, method='linear', **kwargs):
+        self._sensors[name] = SensorCalibration(name, temperature, resistance, method, **kwargs)
+        self._lazy.pop(name, None)
+        return self._sensors[name]
+
+    def register_lazy(self, name, loader):
+        # loader() -> (temperature, resistance, method); run on first use
+        self._lazy[name] = loader
+
+    def load(self, name, path, method='linear', **kwargs):
+        data = self._load_table(path)
+        return self.register(name, data[:, 0], data[:, 1], method, **kwargs)
+
+    def _load_table(self, path):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        key = hashlib.sha1(path.encode()).hexdigest()[:16]
+        cache = os.path.join(self.cache_dir, key + '.npz')
+        try:
+            with np.load(cache) as f:
+                if f['mtime'] == stat.st_mtime and f['size'] == stat.st_size:
+                    return f['data']
+        except (OSError, KeyError, ValueError):
+            pass
+
+        data = np.loadtxt(path, ndmin=2)[:, :2]
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            np.savez(cache, data=data, mtime=stat.st_mtime, size=stat.st_size)
+        except OSError:
+            pass # caching is only an optimisation
+        return data
+
+    def get(self, name):
+        if name not in self._sensors:
+            if name not in self._lazy:
+                raise KeyError('No calibration registered for {}'.format(name))
+            temperature, resistance, method = self._lazy[name]()
+            self.register(name, temperature, resistance, method)
+        return self._sensors[name]
+
+    def convert(self, name, resistance):
+        return self.get(name)(resistance)
+
+
+registry = CalibrationRegistry()
@@ -1,2 +1,9 @@
 from .measurements import Measurements
 from .interpolate_temp import interpolate_temp
+from .pipeline import SweepPipeline
+from .settling import Settler, TemperatureGate
+from .triggers import CrossingTrigger
+from .sweep import Sweep, SweepAxis
+from .planner import TimingModel, SweepPlan, plan
+from .checkpoint import SweepJournal
+from .liveplot import LivePlot
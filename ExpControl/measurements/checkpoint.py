@@ -0,0 +1,123 @@
+import json
+import logging
+import os
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+
+def _plain(obj):
+    # numpy scalars/arrays -> JSON types
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError('{!r} is not JSON serialisable'.format(obj))
+
+
+def _normalise(obj):
+    return json.loads(json.dumps(obj, default=_plain))
+
+
+class SweepJournal:
+    """
+    Append-only checkpoint journal of a sweep (JSON lines).
+
+    The first line holds the sweep spec and the instrument state needed to
+    redo it. Every completed point then appends {"done": index}, flushed
+    and fsynced, so after a crash the journal tells exactly which points
+    are still missing. A truncated last line (crash while writing) is
+    ignored.
+
+        journal = SweepJournal(path, spec, state)
+        if journal.resumed: restore(journal.state)
+        for index in ...:
+            if index in journal: continue
+            ...
+            journal.mark(index)
+        journal.finish()
+
+    Opening an existing journal with a different spec raises ValueError
+    rather than mixing two sweeps.
+    """
+    def __init__(self, path, spec, state=None):
+        self.path = os.path.expanduser(path)
+        self.spec = _normalise(spec)
+        self.done = set()
+        self.finished = False
+        self.resumed = os.path.exists(self.path) and os.path.getsize(self.path) > 0
+        if self.resumed:
+            header = self._load()
+            if header['spec'] != self.spec:
+                raise ValueError('Journal {} belongs to a different sweep'.format(self.path))
+            self.state = header.get('state') or {}
+            log.info('Resuming from %s: %d points done', self.path, len(self.done))
+            with open(self.path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                complete = f.read(1) == b'\n'
+            self._file = open(self.path, 'a')
+            if not complete:
+                self._file.write('\n')
+        else:
+            self.state = _normalise(state or {})
+            self._file = open(self.path, 'w')
+            self._write({'spec': self.spec, 'state': self.state})
+
+    @staticmethod
+    def read(path):
+        """(spec, state, done indices, finished) of an existing journal."""
+        lines = SweepJournal._lines(os.path.expanduser(path))
+        header = lines[0]
+        done = {tuple(l['done']) for l in lines[1:] if 'done' in l}
+        return header['spec'], header.get('state') or {}, done, any(l.get('end') for l in lines)
+
+    @staticmethod
+    def _lines(path):
+        lines = []
+        with open(path) as f:
+            for raw in f:
+                try:
+                    lines.append(json.loads(raw))
+                except ValueError:
+                    log.warning('Ignoring damaged journal line in %s', path)
+        if not lines or 'spec' not in lines[0]:
+            raise ValueError('{} is not a sweep journal'.format(path))
+        return lines
+
+    def _load(self):
+        lines = self._lines(self.path)
+        for l in lines[1:]:
+            if 'done' in l:
+                self.done.add(tuple(l['done']))
+            self.finished = self.finished or bool(l.get('end'))
+        return lines[0]
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, default=_plain) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def __contains__(self, index):
+        return tuple(_normalise(list(index))) in self.done
+
+    def __len__(self):
+        return len(self.done)
+
+    def mark(self, index):
+        index = tuple(_normalise(list(index)))
+        self.done.add(index)
+        self._write({'done': list(index)})
+
+    def finish(self):
+        self.finished = True
+        self._write({'end': True})
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,94 +1,2 @@
-import numpy as np
-
-#Temperature             Resistance
-#(Kelvin)                (Ohms)
-calstr='''1.19599749183145E+00   5.52349489299153E+02
-1.29735565242007E+00   5.19394850266559E+02
-1.39826409149839E+00   4.91653323798411E+02
-1.60086311429485E+00   4.46881063025457E+02
-1.80019558634674E+00   4.12915200085161E+02
-2.00427709389957E+00   3.85355329858201E+02
-2.19844273876915E+00   3.63924283826711E+02
-2.39855409900296E+00   3.45393437909628E+02
-2.60352474552382E+00   3.29248525870002E+02
-2.79771783470120E+00   3.16041525092495E+02
-2.99577449555218E+00   3.04274028260883E+02
-3.19651917581051E+00   2.93743056462678E+02
-3.39765697454376E+00   2.84379411519045E+02
-3.59962650735098E+00   2.75954734042603E+02
-3.80000774681757E+00   2.68393005870432E+02
-3.99788142182910E+00   2.61651022271166E+02
-4.20463761316901E+00   2.55181976860894E+02
-4.67999178418143E+00   2.42310182337541E+02
-5.09461150331923E+00   2.32803836580425E+02
-5.61094558758009E+00   2.22701168023164E+02
-6.33315657549514E+00   2.10999804642153E+02
-7.16340274436487E+00   2.00060145569638E+02
-8.20500212544991E+00   1.88966099761206E+02
-9.25012643880631E+00   1.79924235741976E+02
-1.02893997196097E+01   1.72407422418037E+02
-1.13167960384693E+01   1.66053304440965E+02
-1.23271317262776E+01   1.60600326007099E+02
-1.33205064485018E+01   1.55854572542563E+02
-1.43026850326412E+01   1.51639880152960E+02
-1.52752059346517E+01   1.47860311960946E+02
-1.62361434878072E+01   1.44438314372575E+02
-1.71957449779262E+01   1.41294703358059E+02
-1.81546650085864E+01   1.38376643301660E+02
-1.91125518174270E+01   1.35671532040610E+02
-2.00807869020573E+01   1.33111728605843E+02
-2.11481909011961E+01   1.30460579345886E+02
-2.27292381113893E+01   1.26846767885645E+02
-2.43141143535254E+01   1.23544601200760E+02
-2.59073806543309E+01   1.20464948162349E+02
-2.75007537222538E+01   1.17625207026539E+02
-2.90974651287480E+01   1.14967570709670E+02
-3.08917655535248E+01   1.12194253249294E+02
-3.29909371807486E+01   1.09194122089558E+02
-3.59881214806412E+01   1.05296788758762E+02
-3.89823125810963E+01   1.01789809248880E+02
-4.19862971915099E+01   9.85986005151792E+01
-4.49772350693180E+01   9.56969240218205E+01
-4.79814594367914E+01   9.30229121371371E+01
-4.99808349504042E+01   9.13592432062352E+01
-5.49795276174560E+01   8.75582588324194E+01
-5.99782844438975E+01   8.41852883859229E+01
-6.49750562904864E+01   8.11653123479985E+01
-6.99738470439345E+01   7.84437360025157E+01
-7.49720241702136E+01   7.59699519601274E+01
-7.99606239163806E+01   7.37111682160207E+01
-8.49648749353526E+01   7.16233193827626E+01
-8.99653782467226E+01   6.96907167525714E+01
-9.49625987047088E+01   6.78983969103995E+01
-9.99613200918020E+01   6.62267000119211E+01
-1.09951243188488E+02   6.31881515414996E+01
-1.19965454376036E+02   6.04902032697832E+01
-1.29960826546415E+02   5.80727151981690E+01
-1.39950809192579E+02   5.58893688670617E+01
-1.49948640194402E+02   5.39073373752074E+01
-1.59943535052002E+02   5.20946437872230E+01
-1.69944859195215E+02   5.04388960286053E+01
-1.79948447633782E+02   4.89035686455384E+01
-1.89954947356979E+02   4.74909212763087E+01
-1.99962804930447E+02   4.61801369853372E+01
-2.09966385252083E+02   4.49613931371635E+01
-2.19964978355000E+02   4.38305101919539E+01
-2.29964030515432E+02   4.27735887725076E+01
-2.39956918475775E+02   4.17803062774768E+01
-2.49967909457938E+02   4.08450457129638E+01
-2.59975693381035E+02   3.99702243497653E+01
-2.69979983609033E+02   3.91513876423939E+01
-2.79980859204542E+02   3.83818711311603E+01
-2.89996127788505E+02   3.76541819146853E+01
-2.99997562810024E+02   3.69632706220451E+01
-3.10007310498077E+02   3.63035022882346E+01
-3.15003229006221E+02   3.59803108288871E+01
-3.20017263027512E+02   3.56663926258403E+01
-3.26023446864110E+02   3.53061913429278E+01
-3.30027253337849E+02   3.50638339696913E+01'''
-
-# Parse to 2D array and invert so resistance is increasing
-calibration = np.fromstring(calstr, sep='   ').reshape(-1, 2)[::-1]
-
-def interpolate_temp(resistance):
-    return np.interp(resistance,calibration[:,1],calibration[:,0])
\ No newline at end of file
+# The calibration lives in instrumentcontrol; kept here for old imports
+from ExpControl.instrumentcontrol.interpolate_temp import interpolate_temp, calstr
@@ -0,0 +1,191 @@
+import logging
+import multiprocessing as mp
+import queue
+import time
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+
+def downsample(x, y, npts):
+    """
+    Reduce a trace to about npts points, keeping the minimum and maximum of
+    every bin so narrow resonances survive the decimation.
+    """
+    x, y = np.asarray(x), np.asarray(y)
+    nbins = npts//2
+    if nbins < 1 or len(y) <= npts:
+        return x, y
+    width = len(y)//nbins
+    n = nbins*width
+    ybins = y[:n].reshape(nbins, width)
+    base = np.arange(nbins)*width
+    lo = base + np.argmin(ybins, axis=1)
+    hi = base + np.argmax(ybins, axis=1)
+    idx = np.sort(np.concatenate([lo, hi]))
+    return x[idx], y[idx]
+
+
+def _plot_loop(q, refresh, title):
+    # runs in the plotting process: drains the queue, keeps only the newest
+    # trace and redraws at most 'refresh' times per second
+    from matplotlib import pyplot as plt
+    plt.ion()
+    fig, (ax_trace, ax_map) = plt.subplots(2, 1, figsize=(12, 10))
+    fig.suptitle(title)
+    line, = ax_trace.plot([], [], linewidth=2.0)
+    ax_trace.set_xlabel('Frequency (GHz)')
+    ax_trace.set_ylabel('$S_{21}$ (dB)')
+    ax_trace.grid()
+    ax_map.set_xlabel('Frequency (GHz)')
+    image = cbar = None
+    grid, rows, ys, ylabel = None, [], [], None
+    latest, dirty, last_draw = None, False, 0.
+
+    while plt.fignum_exists(fig.number):
+        try:
+            while True:
+                msg = q.get_nowait()
+                if msg is None:
+                    plt.close(fig)
+                    return
+                if msg[0] == 'trace':
+                    latest = msg[1:4]
+                    dirty = True
+                    continue
+                # ('map', reset, rows): colour map rows, never dropped
+                _, reset, new_rows = msg
+                if reset:
+                    grid, rows, ys, latest = None, [], [], None
+                    if image is not None:
+                        cbar.remove()
+                        image.remove()
+                        image = cbar = None
+                for freqs, mag, y, label in new_rows:
+                    if grid is None:
+                        grid = np.linspace(freqs[0], freqs[-1], 1000)
+                    rows.append(np.interp(grid, freqs, mag, left=np.nan, right=np.nan))
+                    ys.append(y)
+                    ylabel = label
+                dirty = True
+        except queue.Empty:
+            pass
+
+        if dirty and time.monotonic() - last_draw >= 1/refresh:
+            if latest is not None:
+                freqs, mag, y = latest
+                line.set_data(freqs/1e9, mag)
+                ax_trace.relim()
+                ax_trace.autoscale_view()
+                ax_trace.set_title('{:.4f} GHz - {:.4f} GHz'.format(freqs[0]*1e-09, freqs[-1]*1e-09)
+                                   + ('' if y is None else ', {} = {:g}'.format(ylabel, y)))
+            if rows:
+                order = np.argsort(ys)
+                y_sorted = np.asarray(ys)[order]
+                extent = [grid[0]/1e9, grid[-1]/1e9, y_sorted[0], y_sorted[-1] if len(ys) > 1 else y_sorted[0] + 1]
+                data = np.array(rows)[order]
+                if image is None:
+                    image = ax_map.imshow(data, aspect='auto', origin='lower', extent=extent, interpolation='nearest')
+                    cbar = fig.colorbar(image, ax=ax_map, label='$S_{21}$ (dB)')
+                else:
+                    image.set_data(data)
+                    image.set_extent(extent)
+                    image.autoscale()
+                ax_map.set_ylabel(ylabel or '')
+            fig.canvas.draw_idle()
+            dirty, last_draw = False, time.monotonic()
+        plt.pause(0.02)
+
+
+class LivePlot:
+    """
+    Live view of a running measurement in a separate process.
+
+    One persistent figure shows the latest trace and a colour map of
+    |S21| against frequency and the swept quantity (field, current, ...),
+    growing as points come in. The figure redraws at most 'refresh' times
+    per second and submit() never blocks. Traces are downsampled to
+    max_points before they are sent. When the plotting process falls
+    behind, only the latest-trace display skips traces: colour map rows and
+    resets are held here and sent together as soon as the queue has room
+    (at the latest by flush() or close()), so the map never loses a point
+    or mixes two sweeps.
+
+        live = LivePlot()
+        live.submit(freqs, mag, y=field, label='B (mT)')
+        live.close()
+    """
+    def __init__(self, refresh=2., max_points=2000, queue_size=8, title='Live view'):
+        self.refresh = refresh
+        self.max_points = max_points
+        self.dropped = 0
+        self._rows = [] # map rows not yet sent
+        self._reset = False
+        ctx = mp.get_context('spawn')
+        self._queue = ctx.Queue(maxsize=queue_size)
+        self._process = ctx.Process(target=_plot_loop, args=(self._queue, refresh, title),
+                                    name='liveplot', daemon=True)
+        self._process.start()
+
+    @property
+    def alive(self):
+        return self._process.is_alive()
+
+    def submit(self, freqs, mag, y=None, label=None):
+        """Show a trace; y places it in the colour map (None: trace only)."""
+        if not self.alive:
+            return False
+        freqs, mag = downsample(freqs, mag, self.max_points)
+        freqs, mag = np.array(freqs, dtype=float), np.array(mag, dtype=float)
+        if y is not None:
+            self._rows.append((freqs, mag, y, label))
+        self._send_map()
+        try:
+            self._queue.put_nowait(('trace', freqs, mag, y))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def reset(self):
+        """Start a new colour map, e.g. for the next sweep."""
+        self._rows = []
+        self._reset = True
+        if self.alive:
+            self._send_map()
+
+    def flush(self, timeout=5):
+        """Wait until all pending map rows are handed to the plot process."""
+        return self._send_map(timeout)
+
+    def _send_map(self, timeout=None):
+        # pending rows (and reset) go as one message, or stay pending
+        if not self._rows and not self._reset:
+            return True
+        msg = ('map', self._reset, self._rows)
+        try:
+            if timeout is None:
+                self._queue.put_nowait(msg)
+            else:
+                self._queue.put(msg, timeout=timeout)
+        except queue.Full:
+            return False
+        self._rows, self._reset = [], False
+        return True
+
+    def close(self, timeout=5):
+        if self.alive:
+            self.flush(timeout)
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            self._process.join(timeout)
+            if self._process.is_alive():
+                self._process.terminate()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
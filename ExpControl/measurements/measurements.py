@@ -4,19 +4,39 @@ import datetime
 from time import sleep
 from matplotlib import pyplot as plt
 from ExpControl.instrumentcontrol import InstrumentControl
+from ExpControl.dataanalysis import DataAnalysis
 from .interpolate_temp import interpolate_temp
+from .pipeline import SweepPipeline
+from .settling import Settler, TemperatureGate
+from .triggers import CrossingTrigger
+from .sweep import Sweep, SweepAxis
+from .planner import TimingModel, plan
+from .checkpoint import SweepJournal
+from .liveplot import LivePlot
 
 class Measurements:
-    def __init__(self,instr=['vna','gs','prx','keithley','stage']):
+    def __init__(self,instr=['vna','gs','prx','keithley','stage'],reset_vna=True):
 
         self.__ic = InstrumentControl()
+        self.set_tracking_params()
+        self.__temp_gate = TemperatureGate(self.get_temp)
+        # step size dependent settling, see set_settling_params. max_wait
+        # keeps the old fixed delays for steps from an unknown start
+        self.__settlers = {'field':Settler('field', dead_time=2, rate=5, max_wait=60),
+                           'current':Settler('current', dead_time=1, rate=2e-03, max_wait=8)}
+        self.set_timing_model()
+        self.__live = None
         
         if 'vna' in instr:
-            self.__vna = self.__ic.connect_to_vna()
+            self.__vna = self.__ic.connect_to_vna(reset=reset_vna)
         
         if 'prx' in instr:
             self.__prx = self.__ic.connect_to_er032m()
             self.set_zero_field()
+            # settle on the driver's own ramp model (ramp_rate, dead_time).
+            # cf only reads back the setpoint, not the field, so the model is
+            # the only settling criterion for the ER 032M
+            self.__settlers['field'].configure(model=self.__prx.step_time)
         
         if 'gs' in instr:
             self.__gs = self.__ic.connect_to_gs200()
@@ -33,23 +53,31 @@ class Measurements:
     #def setup_vna(self,power=-30,avgs=1,measure='S21',format1='MLOG',format2='PHAS'):
     #    self.__ic.setup_vna(power=power,avgs=avgs,measure=measure,format1=format1,format2=format2)
         
-    def setup_vna(self,power=-30,avgs=1,measure='S21',timeout=5000,format1='MLOG',format2='PHAS',format3='PHAS',format4='PHAS'):
+    def setup_vna(self,power=-30,avgs=1,measure='S21',timeout=5000,data_format='ASC',format1='MLOG',format2='PHAS',format3='PHAS',format4='PHAS'):
         #self.__ic.setup_vna(power=power,avgs=avgs,measure=measure)
         self.__vna.set('power', power)
         self.__vna.set('avg', avgs)
         self.__vna.set('measure', measure)
+        self.__vna.set('data_format', data_format) # 'REAL'/'REAL32' for binary transfer
         #self.__vna.set('format1',format1)
         #self.__vna.set('format2',format2)
         #self.__vna.set('format2',format3)
         #self.__vna.set('format3',format4)
         self.__vna.timeout.set(timeout)
      
-    def setup_keithley(self,current=10e-06, complvoltage = 10e-03):
+    def setup_keithley(self,current=10e-06, complvoltage = 10e-03, reversal=False, pairs=1, on_instrument=False):
+        # reversal=True programs the +I/-I pair(s) into the Keithley once, so
+        # each reading is a single buffered trigger sequence
         self.__keithley_current = current
         self.__keithley_complvoltage = complvoltage
         self.__ic.setup_keithley()
+        self.__keithley_reversal = reversal
+        if reversal:
+            self.__keithley.configure_reversal(current, pairs=pairs, on_instrument=on_instrument)
     
     def resistance_measure(self):
+        if self.__keithley_reversal:
+            return self.__keithley.resistance_reversal()
         self.__keithley.curr(self.__keithley_current)
         self.__keithley.output(1)
         res1 = self.__keithley.resistance()
@@ -61,22 +89,75 @@ class Measurements:
         resistance=(res1+res2)/2
         return resistance
 
-    def get_temp(self):
-        global data
+    def start_thermometry(self, interval=0, size=100000):
+        # stream temperature readings in the background; get_temp() then
+        # returns immediately from the stream
+        self.__keithley.start_stream(interval=interval, size=size, converter=interpolate_temp, measure=self.resistance_measure)
+
+    def stop_thermometry(self):
+        self.__keithley.stop_stream()
+
+    def set_temperature_gate(self, **kwargs):
+        # window (s), interval (s), max_slope (K/min), max_std (K), timeout (s)
+        # for wait_for_stable_temp and the stable_temp option of the sweeps
+        self.__temp_gate.configure(**kwargs)
+
+    def __temp_history(self):
+        if not self.__keithley.is_streaming():
+            return None
+        return lambda: self.__keithley.stream.data()[:,[0,2]]
+
+    def wait_for_stable_temp(self, timeout=None, **kwargs):
+        # Blocks until dT/dt and the scatter of the temperature over the
+        # sliding window are below the gate thresholds; uses the background
+        # stream when start_thermometry() is running
+        if kwargs:
+            self.set_temperature_gate(**kwargs)
+        self.__temp_gate.history = self.__temp_history()
+        return self.__temp_gate.wait(timeout)
+
+    def get_temp(self, window=None, timeout=10):
+        # window: mean over the last 'window' seconds of the stream. While
+        # the stream runs it owns the Keithley (the +I/-I sequence of
+        # resistance_measure must not interleave with it), so wait for its
+        # first sample instead of measuring here
+        if self.__keithley.is_streaming():
+            temp = self.__keithley.latest_temperature(window, timeout=timeout)
+            if temp is None:
+                raise TimeoutError('No thermometry sample within {} s'.format(timeout))
+            return temp
         resistance=self.resistance_measure();
         temp=interpolate_temp(resistance);
         return temp
     
-    def trace(self,start,stop,npts=1001,bandwidth=1000,background=None,plotting=True):
-        self.__vna.set('npts', npts)
-        self.__vna.set('bandwidth', bandwidth)
+    def __read_trace(self,iq=False,while_sweeping=None,npts=None,bandwidth=None):
+        # npts/bandwidth given: the sweep and transfer times are recorded
+        # for the timing model (see estimate_sweep)
+        param = self.__vna.sparam if iq else self.__vna.trace
+        t0 = datetime.datetime.now()
+        self.__vna.acquire(callback=while_sweeping)
+        t1 = datetime.datetime.now()
+        data = param.fetch()
+        self.__vna.cont_meas_on()
+        if npts is not None and bandwidth is not None:
+            self.__timing.record_trace(npts, bandwidth, self.__vna.setting('avg'),
+                                       sweep=(t1 - t0).total_seconds(),
+                                       transfer=(datetime.datetime.now() - t1).total_seconds())
+        return data
 
-        freqs = np.linspace(start, stop, npts)
-        self.__vna.set('start', start)
-        self.__vna.set('stop', stop)
+    def trace(self,start,stop,npts=1001,bandwidth=1000,background=None,plotting=True,iq=False,while_sweeping=None):
+        # iq=True reads the complex S21 in one query; data is then
+        # (magnitude, phase, unwrapped_phase, sdata)
+        # while_sweeping() is called repeatedly while the VNA is busy, e.g. to
+        # read the Keithley or talk to the magnet
+        if self.__vna.is_segmented():
+            self.__vna.linear_sweep()
+        # only settings that changed since the last trace are sent
+        self.__vna.configure(npts=npts, bandwidth=bandwidth, start=start, stop=stop)
+        freqs = self.__vna.frequencies()
         
         t0 = datetime.datetime.now()
-        data = self.__vna.trace()
+        data = self.__read_trace(iq, while_sweeping, npts, bandwidth)
         print('Trace took {}'.format(datetime.datetime.now() - t0))
         
         NoneType = type(None)
@@ -84,17 +165,60 @@ class Measurements:
             data[0] -= background
         
         if plotting:
-            plt.figure(figsize=(12,10))
-            plt.plot(freqs/1e9, data[0],linewidth=3.0)
-            # plt.plot(freqs/1e9, data[1])
-            plt.xlabel('Frequency (GHz)',fontsize=28)
-            plt.ylabel('$S_{21}$ (dB)',fontsize=28)
-            plt.title('{:.4f} GHz - {:.4f} GHz'.format(start*1e-09,stop*1e-09),fontsize=30)
-            plt.grid()
-            plt.show()
+            self.__show(freqs, data)
 
         return freqs,data
         
+    def plot_trace(self,freqs,data,marker='-'):
+        plt.figure(figsize=(12,10))
+        plt.plot(freqs/1e9, data[0],marker,linewidth=3.0)
+        # plt.plot(freqs/1e9, data[1])
+        plt.xlabel('Frequency (GHz)',fontsize=28)
+        plt.ylabel('$S_{21}$ (dB)',fontsize=28)
+        plt.title('{:.4f} GHz - {:.4f} GHz'.format(freqs[0]*1e-09,freqs[-1]*1e-09),fontsize=30)
+        plt.grid()
+        plt.show()
+
+    def live_view(self, on=True, refresh=2, max_points=2000):
+        # One persistent live figure in a separate process (see LivePlot):
+        # latest trace plus a colour map of the running sweep, redrawn at
+        # most 'refresh' times per second. While it is on, trace() and the
+        # sweeps plot into it instead of opening a new figure per trace.
+        # It runs in a spawned process, which re-imports the calling script:
+        # scripts need an 'if __name__ == "__main__":' guard.
+        if self.__live is not None:
+            self.__live.close()
+            self.__live = None
+        if on:
+            self.__live = LivePlot(refresh=refresh, max_points=max_points)
+        return self.__live
+
+    def __show(self, freqs, data, y=None, label=None, marker='-'):
+        if self.__live is not None and self.__live.alive:
+            self.__live.submit(freqs, data[0], y, label)
+        else:
+            self.plot_trace(freqs, data, marker)
+
+    def segment_trace(self,segments,bandwidth=1000,background=None,plotting=True,iq=False,while_sweeping=None):
+        # segments: list of (start, stop, npts[, ifbw, power]) tuples, e.g.
+        # from resonance_segments(), to sample densely around resonances only
+        self.__vna.configure(bandwidth=bandwidth)
+        self.__vna.set_segments(segments)
+        freqs = self.__vna.frequencies()
+
+        t0 = datetime.datetime.now()
+        data = self.__read_trace(iq, while_sweeping, len(freqs), bandwidth)
+        print('Trace took {}'.format(datetime.datetime.now() - t0))
+
+        NoneType = type(None)
+        if not isinstance(background, NoneType):
+            data[0] -= background
+
+        if plotting:
+            self.__show(freqs, data, marker='.-')
+
+        return freqs,data
+
     # def trace(self,start,stop,npts=1001,bandwidth=1000):
         # #self.__vna.timeout.set(5000)
         # self.__vna.set('npts', npts)
@@ -131,32 +255,342 @@ class Measurements:
         self.__ic.set_zero_field()
         
     def set_field(self,field_gauss):
-        caled_field = self.__ic.field_cal(field_gauss)
-        self.__prx.open()
-        self.__prx.write('CF+{}'.format(caled_field))
-        self.__prx.close()
+        # the driver applies field_cal
+        self.__prx.field(field_gauss)
     
-    def run_field_sweep(self, npts=2001, bw=1000, save='on', file='~\\'):
+    def set_settling_params(self, name, vna_snapshot=False, **kwargs):
+        # Tune the settling of 'field' (G) or 'current' (A), e.g.
+        # set_settling_params('field', dead_time=1, rate=10, max_wait=30)
+        # See Settler for the settings. vna_snapshot=True also waits until
+        # consecutive traces of the current VNA sweep agree to within
+        # snapshot_tolerance (dB).
+        if vna_snapshot:
+            kwargs['snapshot'] = lambda: self.__read_trace()[0]
+        self.__settlers[name].configure(**kwargs)
+        return self.__settlers[name]
+
+    def settle(self, name, target, previous=None):
+        return self.__settlers[name].wait(target, previous)
+
+    def set_timing_model(self, path='~/.expcontrol_timing.json'):
+        # Timing model used by the estimate_* methods. Measured sweep,
+        # transfer, save and settle times of every run are added to it and
+        # it is refitted and written back to path (JSON) after each sweep.
+        self.__timing = TimingModel(path)
+        self.__settle_seen = {name: len(s.history) for name, s in self.__settlers.items()}
+        return self.__timing
+
+    def __update_timing(self):
+        for name, settler in self.__settlers.items():
+            for target, step, elapsed in settler.history[self.__settle_seen.get(name, 0):]:
+                if step is not None: # unknown start: worst case wait, not a model sample
+                    self.__timing.record_settle(name, settler.predicted(step), elapsed)
+            self.__settle_seen[name] = len(settler.history)
+        self.__timing.fit()
+        if self.__timing.path is not None:
+            self.__timing.save()
+
+    def estimate_sweep(self, axes, npts=2001, bw=1000, save='on', order='serpentine'):
+        # Dry run of run_sweep: every setpoint is checked against the limits
+        # and the runtime predicted from the timing model. Nothing moves.
+        sweep = Sweep(axes, None, order=order)
+        p = plan(sweep, self.__timing, npts, bw,
+                 self.__vna.setting('avg'), bool(save), sweep.position())
+        print(p)
+        return p
+
+    def estimate_field_sweep(self, npts=2001, bw=1000, save='on'):
+        field_arr = np.arange(self.__blow,self.__bhigh,self.__bit)
+        return self.estimate_sweep([self.field_axis(field_arr)], npts, bw, save, order='raster')
+
+    def estimate_current_sweep(self, npts=2001, bw=1000, save='on'):
+        current_arr = np.arange(self.__Ilow,self.__Ihigh,self.__Iit)
+        return self.estimate_sweep([self.current_axis(current_arr)], npts, bw, save, order='raster')
+
+    def set_tracking_params(self, span_factor=10, min_span=1e06, npts=201, bw=None, min_contrast=3, fit='estimate'):
+        # Resonance tracking for run_field_sweep(track=True): each trace is
+        # centred on the last resonance with a span of span_factor*fwhm
+        # (at least min_span). A peak less than min_contrast dB above the
+        # background, or at the edge of the window, counts as lost and the
+        # next trace is the full flow..fhigh window again.
+        # fit: 'estimate' (fast peak/half-max) or 'lorentzian' (LorentzianFit)
+        self.__track = {'span_factor':span_factor, 'min_span':min_span, 'npts':npts,
+                        'bw':bw, 'min_contrast':min_contrast, 'fit':fit}
+
+    def __locate_resonance(self, freqs, mag, fit='estimate'):
+        est = DataAnalysis().estimate_resonance(freqs, mag)
+        if fit == 'lorentzian':
+            lor = DataAnalysis().LorentzianFit(freqs, mag, plot=False)
+            est['centre'] = lor['centre']*1e06 # MHz -> Hz
+            est['fwhm'] = abs(lor['sigma'])*1e06
+        return est
+
+    def __next_window(self, freqs, mag):
+        # window (start, stop, tracking) for the trace after this one
+        tp = self.__track
+        est = self.__locate_resonance(freqs, mag, tp['fit'])
+        edge = 0.05*(freqs[-1] - freqs[0])
+        found = (est['contrast'] >= tp['min_contrast']
+                 and freqs[0] + edge < est['centre'] < freqs[-1] - edge)
+        if not found:
+            print('Resonance lost, returning to wide sweep')
+            return self.__flow, self.__fhigh, False
+
+        span = min(max(tp['span_factor']*est['fwhm'], tp['min_span']), self.__fhigh - self.__flow)
+        start = max(est['centre'] - span/2, self.__flow)
+        stop = min(est['centre'] + span/2, self.__fhigh)
+        return start, stop, True
+
+    def __save_trace(self, filename, tr, iq=False, **extra):
+        # extra: constant columns stored with the trace, e.g. T_start
+        cols = {'freq':tr[0],'ch1':tr[1][0],'ch2':tr[1][1]}
+        if iq:
+            cols.update({'I':tr[1][3].real,'Q':tr[1][3].imag})
+        cols.update(extra)
+        t0 = datetime.datetime.now()
+        df = pd.DataFrame(data=cols)
+        df.to_pickle(filename)
+        self.__timing.record_save(len(tr[0]), (datetime.datetime.now() - t0).total_seconds())
+
+    def __instrument_state(self):
+        # settings re-established when a journalled sweep resumes
+        # (driver cache, or read back; never None)
+        return {'vna': {'power': self.__vna.setting('power'), 'avgs': self.__vna.setting('avg'),
+                        'measure': self.__vna.measure().strip().strip('"').upper(),
+                        'data_format': self.__vna.setting('data_format')}}
+
+    def __open_journal(self, journal, spec):
+        # journal: path of the checkpoint file. An existing journal of the
+        # same sweep resumes it, restoring the VNA setup it was started with.
+        # Only saved points can be skipped on resume, so it needs save.
+        if journal is None:
+            return None
+        if not spec.get('save'):
+            raise ValueError('A journal needs save: unsaved points would be skipped on resume')
+        jr = SweepJournal(journal, spec, self.__instrument_state())
+        if jr.resumed:
+            print('Resuming sweep: {} points already done'.format(len(jr)))
+            if 'vna' in jr.state:
+                self.setup_vna(**jr.state['vna'])
+        return jr
+
+    def run_field_sweep(self, npts=2001, bw=1000, save='on', file='~\\', iq=False, track=False, pipelined=False, fit=False, stable_temp=None, journal=None, live=False):
+        # track=True zooms each trace onto the resonance found in the last
+        # one, see set_tracking_params
+        # pipelined=True hands saving and fitting of each point to background
+        # workers (see SweepPipeline) so they run while the magnet settles on
+        # the next field; plotting stays on the calling thread. fit=True fits every trace and returns
+        # a list of (field, fit) results.
+        # stable_temp='start' waits for a stable temperature before the
+        # sweep, 'point' before every field point (see set_temperature_gate)
+        # journal='path.jsonl' checkpoints every saved point; running the
+        # same sweep with the same journal after a crash skips the points
+        # already done (see resume_field_sweep). Fits only cover new points.
+        # live=True shows the sweep in the live view (started if needed)
+        # instead of a new figure per field point. The live view is a
+        # spawned process, so scripts using it need an
+        # 'if __name__ == "__main__":' guard.
         
         field_arr = np.arange(self.__blow,self.__bhigh,self.__bit)
+        self.field_axis(field_arr).check()
+        start, stop, tracking = self.__flow, self.__fhigh, False
+        jr = self.__open_journal(journal, {'kind': 'field_sweep', 'blow': self.__blow, 'bhigh': self.__bhigh, 'bit': self.__bit, 'field_limit': self.__field_limit,
+                                           'flow': self.__flow, 'fhigh': self.__fhigh, 'npts': npts, 'bw': bw,
+                                           'save': save, 'file': file, 'iq': iq, 'track': track})
+
+        def save_stage(item):
+            i, field, tr = item
+            self.__save_trace(file + '{} mT.pkl'.format(field/10), tr, iq)
+            if jr is not None:
+                jr.mark((i,))
+
+        def plot_stage(item):
+            i, field, tr = item
+            self.__show(tr[0], tr[1], field/10, 'B (mT)')
+
+        def fit_stage(item):
+            i, field, tr = item
+            return field, self.__locate_resonance(tr[0], tr[1][0], self.__track['fit'])
+
+        # plotting stays on this thread: pyplot is not thread safe
+        stages = {}
+        if save:
+            stages['save'] = save_stage
+        if fit:
+            stages['fit'] = fit_stage
+        pipe = SweepPipeline(stages) if pipelined else None
+        fits = []
+
+        if live:
+            if self.__live is None or not self.__live.alive:
+                self.live_view()
+            self.__live.reset()
+
+        if stable_temp:
+            self.wait_for_stable_temp()
 
         t0 = datetime.datetime.now()
-        for i in range(0,len(field_arr)):
-            if field_arr[i] > self.__field_limit:
-                raise Exception('Field = {:.3f}  mT- exceeds field limit ({:.3f} mT)'.format(field_arr[i]/10,self.__field_limit/10))
-            else:
-                self.__prx.open()
-                self.__prx.write('CF+{}.00'.format(field_arr[i]))
-                sleep(10)
-                tr = self.trace(self.__flow,self.__fhigh,npts=npts,bandwidth=bw,background=None,plotting=True)
-                self.__prx.close()
-                print('B = {:.3f} mT'.format(field_arr[i]/10))
-                
-                if save:
-                    filename = file + '{} mT.pkl'.format(field_arr[i]/10)
-                    df = pd.DataFrame(data={'freq':tr[0],'ch1':tr[1][0],'ch2':tr[1][1]})
-                    df.to_pickle(filename)
+        previous = self.__prx.cf() # first step is the ramp from wherever the magnet is
+        try:
+            for i in range(0,len(field_arr)):
+                if jr is not None and (i,) in jr:
+                    continue
+                if field_arr[i] > self.__field_limit:
+                    raise Exception('Field = {:.3f}  mT- exceeds field limit ({:.3f} mT)'.format(field_arr[i]/10,self.__field_limit/10))
+                else:
+                    self.__prx.cf(field_arr[i])
+                    self.settle('field', field_arr[i], previous)
+                    previous = field_arr[i]
+                    if stable_temp == 'point' and i:
+                        self.wait_for_stable_temp()
+                    if tracking:
+                        tr = self.trace(start,stop,npts=self.__track['npts'],bandwidth=self.__track['bw'] or bw,background=None,plotting=False,iq=iq)
+                    else:
+                        tr = self.trace(start,stop,npts=npts,bandwidth=bw,background=None,plotting=False,iq=iq)
+                    print('B = {:.3f} mT'.format(field_arr[i]/10))
+                    plot_stage((i, field_arr[i], tr))
+
+                    if track:
+                        start, stop, tracking = self.__next_window(tr[0], tr[1][0])
+
+                    if pipelined:
+                        pipe.submit((i, field_arr[i], tr))
+                        continue
+
+                    if save:
+                        filename = file + '{} mT.pkl'.format(field_arr[i]/10)
+                        self.__save_trace(filename, tr, iq)
+                        if jr is not None:
+                            jr.mark((i,))
+                    if fit:
+                        fits.append(fit_stage((i, field_arr[i], tr)))
+            if pipelined:
+                pipe.close()
+            if jr is not None:
+                jr.finish()
+        except BaseException:
+            # don't let a failing stage hide why the sweep stopped
+            if pipelined:
+                try:
+                    pipe.close()
+                except RuntimeError as e:
+                    print('Pipeline failed while aborting: {!r}'.format(e.__cause__))
+            raise
+        finally:
+            if jr is not None:
+                jr.close()
+        if pipelined:
+            fits = pipe.results.get('fit', [])
+
+        print('Sweep took {}'.format(datetime.datetime.now() - t0))
+        if self.__live is not None and self.__live.alive:
+            self.__live.flush()
+        self.__update_timing()
+        if fit:
+            return sorted(fits, key=lambda r: r[0])
         
+    def run_cooldown_traces(self, temps, start, stop, npts=2001, bw=1000, save='on', file='~\\', direction='down', iq=False, interval=0.5, timeout=None):
+        # Takes a trace every time the temperature crosses one of 'temps'
+        # during a free cooldown (or warm up, direction='up'), instead of
+        # stabilising at each. Temperatures come from the Keithley stream,
+        # which is started if needed. Returns the trigger records, with the
+        # temperature at the start and end of each trace. With save each
+        # trace is written as soon as it is taken and only its file name is
+        # kept in the record, so an abort loses nothing already measured.
+        if not self.__keithley.is_streaming():
+            self.start_thermometry()
+
+        def acquire(setpoint):
+            tr = self.trace(start,stop,npts=npts,bandwidth=bw,background=None,plotting=False,iq=iq)
+            print('T = {:.3f} K'.format(setpoint))
+            return tr
+
+        def save_record(rec):
+            filename = file + '{:.3f} K.pkl'.format(rec['setpoint'])
+            self.__save_trace(filename, rec['result'], iq, T_start=rec['value_start'], T_end=rec['value_end'])
+            return filename
+
+        trig = CrossingTrigger(temps, acquire, direction=direction, on_record=save_record if save else None)
+        return trig.run(self.get_temp, interval=interval, timeout=timeout)
+
+    def field_axis(self, values, direction=None, reset=None):
+        # raw CF setting in G, limited to +-field_limit (set_field_sweep_params)
+        # and to the range of the cf validator (-50 G to 25 kG)
+        # direction='up'/'down' keeps the field on one branch of the
+        # hysteresis loop, going via reset when it has to move back
+        return SweepAxis('field', values, self.__prx.cf, settle=self.__settlers['field'], getter=self.__prx.cf,
+                         limits=(-self.__field_limit, self.__field_limit), unit='G', direction=direction, reset=reset)
+
+    def current_axis(self, values, direction=None, reset=None):
+        # limited to +-current_limit (set_current_sweep_params)
+        return SweepAxis('current', values, self.__gs.current, settle=self.__settlers['current'], getter=self.__gs.current,
+                         limits=(-self.__current_limit, self.__current_limit), unit='A', direction=direction, reset=reset)
+
+    def power_axis(self, values, limits=(-85, 10)):
+        return SweepAxis('power', values, self.__vna.power, limits=limits, unit='dBm')
+
+    def angle_axis(self, positions, settle=1.0):
+        # absolute rotating stage positions in motor steps (50 steps ~ 4.5 deg)
+        def move(position):
+            delta = int(position) - self.__stage.position()
+            if delta:
+                self.__stage.steps(abs(delta))
+                if delta > 0:
+                    self.__stage.stepleft()
+                else:
+                    self.__stage.stepright()
+        return SweepAxis('angle', positions, move, settle=settle, unit='steps')
+
+    def resume_field_sweep(self, journal, stable_temp=None):
+        # restart an interrupted run_field_sweep from its journal alone
+        spec, state, done, finished = SweepJournal.read(journal)
+        if spec.get('kind') != 'field_sweep':
+            raise ValueError('{} is not a field sweep journal'.format(journal))
+        self.set_field_sweep_params(blow=spec['blow'], bhigh=spec['bhigh'], bit=spec['bit'],
+                                    field_limit=spec['field_limit'], flow=spec['flow'], fhigh=spec['fhigh'])
+        return self.run_field_sweep(npts=spec['npts'], bw=spec['bw'], save=spec['save'], file=spec['file'],
+                                    iq=spec['iq'], track=spec['track'], stable_temp=stable_temp, journal=journal)
+
+    def run_sweep(self, axes, start, stop, npts=2001, bw=1000, save='on', file='~\\', iq=False, stable_temp=None, order='serpentine', journal=None):
+        # One trace per point of the nested axes, outermost first, e.g.
+        #   m.run_sweep([m.field_axis(fields), m.power_axis(powers)], 7e9, 8e9)
+        # Every setpoint is checked against its limits before anything moves.
+        # order: 'raster', 'serpentine' or 'min_ramp' (see Sweep); inner
+        # axes no longer ramp back to their first value on every pass.
+        # Traces are saved as <file>field=..._power=....pkl with the axis
+        # values as extra columns. Returns {index tuple: trace}.
+        # journal='path.jsonl' checkpoints every point: calling run_sweep
+        # again with the same axes and journal resumes after a crash.
+        def acquire(point):
+            if stable_temp == 'point':
+                self.wait_for_stable_temp()
+            return self.trace(start,stop,npts=npts,bandwidth=bw,background=None,plotting=False,iq=iq)
+
+        def store(index, point, tr):
+            name = '_'.join('{}={}'.format(k, v) for k, v in point.items())
+            print(name)
+            if save:
+                self.__save_trace(file + name + '.pkl', tr, iq, **point)
+
+        sweep = Sweep(axes, acquire, store, order=order)
+        position = sweep.position()
+        p = plan(sweep, self.__timing, npts, bw, self.__vna.setting('avg'), bool(save), position)
+        print(p)
+        p.raise_errors()
+        if stable_temp:
+            self.wait_for_stable_temp()
+        spec = dict(sweep.spec(), kind='sweep', start=start, stop=stop, npts=npts, bw=bw, save=save, file=file, iq=iq)
+        jr = self.__open_journal(journal, spec)
+        t0 = datetime.datetime.now()
+        try:
+            results = sweep.run(position, journal=jr)
+        finally:
+            if jr is not None:
+                jr.close()
+        print('Sweep took {}'.format(datetime.datetime.now() - t0))
+        self.__update_timing()
+        return results
+
     def set_current_sweep_params(self, Ilow=0, Ihigh=1e-02, Iit = 500e-06, current_limit = 2e-01, flow=7.490e09, fhigh=7.494e09):
         self.__Ilow = Ilow
         self.__Ihigh = Ihigh
@@ -165,13 +599,27 @@ class Measurements:
         self.__flow = flow
         self.__fhigh = fhigh
     
-    def current_sweep(self, field=0, npts=2001, bw=1000, save='on', file='~\\'):
+    def current_sweep(self, field=0, npts=2001, bw=1000, save='on', file='~\\', hardware=False, interval=None, delay=0.5, iq=False, stable_temp=None):
+        # hardware=True loads the whole current list into the GS200 program
+        # memory and lets the GS200 trigger output start each VNA sweep
+        # (TRIG:SOUR EXT, 'delay' seconds after each step). Python only
+        # fetches and saves the traces. 'interval' is the time per step
+        # (defaults to twice the measured sweep time plus delay plus the
+        # measured fetch and re-arm time). A missed trigger raises at once.
+        # stable_temp: as for run_field_sweep ('point' is ignored in
+        # hardware mode, where the GS200 sets the pace)
         current_arr = np.arange(self.__Ilow,self.__Ihigh,self.__Iit)
+        self.current_axis(current_arr).check()
+        if stable_temp:
+            self.wait_for_stable_temp()
+        if hardware:
+            return self.__hardware_current_sweep(current_arr, npts, bw, save, file, interval, delay, iq)
 
         self.__gs.output('on')    
-        time.sleep(3)
+        sleep(3)
 
         t0 = datetime.datetime.now()
+        previous = self.__gs.current()
         for i in range(0,len(current_arr)):
             current = current_arr[i]
             if current > self.__current_limit:
@@ -179,10 +627,74 @@ class Measurements:
             else:
                 self.__gs.current(current)
                 print('Current = {:.3f} $\mu A$'.format(current*1e06))
-                time.sleep(8)
-                trace(self.__flow,self.__fhigh,field=field,current=current,npts=npts,bandwidth=bw,save=save,filedir=file)        
+                self.settle('current', current, previous)
+                previous = current
+                if stable_temp == 'point' and i:
+                    self.wait_for_stable_temp()
+                tr = self.trace(self.__flow,self.__fhigh,npts=npts,bandwidth=bw,background=None,plotting=False,iq=iq)
+                if save:
+                    self.__save_trace(file + '{} G {:.3f} uA.pkl'.format(field, current*1e06), tr, iq, current=current)
         
         print('Sweep took {}'.format(datetime.datetime.now() - t0))
+        self.__update_timing()
         self.__gs.current(0)
         self.__gs.output('off')        
         return
+
+    def __hardware_current_sweep(self, current_arr, npts, bw, save, file, interval, delay, iq):
+        over = current_arr[np.abs(current_arr) > self.__current_limit]
+        if over.size:
+            raise Exception('Current = {:.3f}  uA- exceeds current limit ({:.3f} uA)'.format(over[0]*1e06,self.__current_limit*1e06))
+
+        self.__vna.configure(npts=npts, bandwidth=bw, start=self.__flow, stop=self.__fhigh)
+        freqs = self.__vna.frequencies()
+        param = self.__vna.sparam if iq else self.__vna.trace
+        if interval is None:
+            # sweep time plus the fetch and re-arm that must fit in before
+            # the next trigger pulse, with one spare sweep time
+            t0 = datetime.datetime.now()
+            self.__vna.acquire()
+            t1 = datetime.datetime.now()
+            param.fetch()
+            self.__vna.arm_external(delay=delay)
+            t2 = datetime.datetime.now()
+            self.__vna.external_trigger_off()
+            sweep, overhead = (t1 - t0).total_seconds(), (t2 - t1).total_seconds()
+            interval = 2*sweep + overhead + delay
+            print('Step interval {:.3f} s (sweep {:.3f} s, fetch and re-arm {:.3f} s)'.format(interval, sweep, overhead))
+
+        self.__ic.load_gs200_program(current_arr, interval=interval)
+        self.__gs.current(current_arr[0])
+        self.__gs.output('on')
+        sleep(3)
+
+        traces = []
+        t0 = datetime.datetime.now()
+        try:
+            self.__vna.arm_external(delay=delay)
+            self.__ic.run_gs200_program()
+            t_run = datetime.datetime.now()
+            for i, current in enumerate(current_arr):
+                self.__vna.wait(timeout=10*interval)
+                data = param.fetch()
+                if i < len(current_arr) - 1:
+                    self.__vna.arm_external(delay=delay)
+                    # trigger i+1 fires (i+1)*interval after the program
+                    # started; armed any later, it was missed and every
+                    # following trace would belong to the wrong current
+                    armed = (datetime.datetime.now() - t_run).total_seconds()
+                    if armed > (i + 1)*interval:
+                        raise RuntimeError('Missed the GS200 trigger for {:.3f} uA: re-armed {:.3f} s after the program '
+                                           'started, trigger was at {:.3f} s. Use a longer interval.'.format(
+                                               current_arr[i+1]*1e06, armed, (i + 1)*interval))
+                traces.append(data)
+                print('Current = {:.3f} $\mu A$'.format(current*1e06))
+                if save:
+                    self.__save_trace(file + '{} uA.pkl'.format(current*1e06), (freqs, data), iq)
+        finally:
+            self.__vna.external_trigger_off()
+            print('Sweep took {}'.format(datetime.datetime.now() - t0))
+            self.__gs.current(0)
+            self.__gs.output('off')
+
+        return freqs, current_arr, traces
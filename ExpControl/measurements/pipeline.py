@@ -0,0 +1,70 @@
+import threading
+import queue
+
+_STOP = object()
+
+
+class SweepPipeline:
+    """
+    Background workers for the per point post-processing of a sweep
+    (saving, plotting, fitting), so it overlaps with magnet settling and the
+    next VNA acquisition.
+
+    Each stage is a callable taking the submitted item and runs in its own
+    thread with a bounded queue; submit() blocks when a stage falls
+    'maxsize' points behind, which caps the memory held by the pipeline.
+    Exceptions raised by a stage are collected and re-raised by close().
+
+    with SweepPipeline({'save': save, 'fit': fit}) as pipe:
+        for point in sweep:
+            pipe.submit(acquire(point))
+    """
+    def __init__(self, stages, maxsize=4):
+        self.errors = []
+        self._closed = False
+        self.results = {name: [] for name in stages}
+        self._workers = []
+        for name, func in stages.items():
+            q = queue.Queue(maxsize=maxsize)
+            t = threading.Thread(target=self._work, args=(name, func, q),
+                                 name='pipeline-{}'.format(name), daemon=True)
+            t.start()
+            self._workers.append((q, t))
+
+    def _work(self, name, func, q):
+        while True:
+            item = q.get()
+            if item is _STOP:
+                return
+            try:
+                result = func(item)
+                if result is not None:
+                    self.results[name].append(result)
+            except Exception as e:
+                self.errors.append((name, e))
+
+    def submit(self, item):
+        if self.errors:
+            self.close()
+        for q, t in self._workers:
+            q.put(item)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        for q, t in self._workers:
+            if t.is_alive():
+                q.put(_STOP)
+        for q, t in self._workers:
+            t.join()
+        if self.errors:
+            name, e = self.errors[0]
+            raise RuntimeError('Pipeline stage \'{}\' failed'.format(name)) from e
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
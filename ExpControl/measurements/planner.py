@@ -0,0 +1,180 @@
+import json
+import logging
+import os
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+
+class TimingModel:
+    """
+    Predicts how long the parts of a sweep take.
+
+    - VNA sweep:  sweep_overhead + sweep_factor*npts*averages/ifbw
+    - transfer:   transfer_overhead + transfer_per_point*npts
+    - save:       save_overhead + save_per_point*npts
+    - settling:   the axis' own model (Settler.predicted, or a fixed delay)
+                  times a per-axis settle_scale, plus move_overhead
+
+    The defaults are rough E5071C/ER 032M numbers. record_trace(),
+    record_save() and record_settle() collect measured timings, fit() refits the
+    coefficients from them and save()/load() keep samples and coefficients
+    in a JSON file, so every run improves the estimate for the next.
+    """
+    DEFAULTS = {'sweep_overhead': 0.05, 'sweep_factor': 1.1,
+                'transfer_overhead': 0.02, 'transfer_per_point': 2e-05,
+                'save_overhead': 0.01, 'save_per_point': 1e-05,
+                'move_overhead': 0.05}
+    MAX_SAMPLES = 500
+
+    def __init__(self, path=None):
+        self.path = path
+        self.coef = dict(self.DEFAULTS)
+        self.settle_scale = {}
+        self.samples = {'trace': [], 'save': [], 'settle': {}}
+        if path is not None and os.path.exists(os.path.expanduser(path)):
+            self.load(path)
+
+    def load(self, path=None):
+        path = os.path.expanduser(path or self.path)
+        with open(path) as f:
+            state = json.load(f)
+        self.coef.update(state.get('coef', {}))
+        self.settle_scale.update(state.get('settle_scale', {}))
+        samples = state.get('samples', {})
+        self.samples['trace'] = samples.get('trace', [])
+        self.samples['save'] = samples.get('save', [])
+        self.samples['settle'] = samples.get('settle', {})
+
+    def save(self, path=None):
+        path = os.path.expanduser(path or self.path)
+        state = {'coef': self.coef, 'settle_scale': self.settle_scale,
+                 'samples': self.samples}
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(state, f, indent=1)
+        os.replace(tmp, path)
+
+    def record_trace(self, npts, ifbw, averages=1, sweep=None, transfer=None):
+        """Store the measured times (s) of one trace; None where not timed."""
+        self.samples['trace'].append([npts, ifbw, averages, sweep, transfer])
+        del self.samples['trace'][:-self.MAX_SAMPLES]
+
+    def record_save(self, npts, seconds):
+        """Store the measured time (s) to save a trace of npts points."""
+        self.samples['save'].append([npts, seconds])
+        del self.samples['save'][:-self.MAX_SAMPLES]
+
+    def record_settle(self, axis, predicted, measured):
+        samples = self.samples['settle'].setdefault(axis, [])
+        samples.append([predicted, measured])
+        del samples[:-self.MAX_SAMPLES]
+
+    def fit(self):
+        """Refit the coefficients from the recorded samples."""
+        trace = [s for s in self.samples['trace'] if None not in s[:3]]
+        for samples, col, x_of, names in (
+                (trace, 3, lambda s: s[0]*s[2]/s[1], ('sweep_overhead', 'sweep_factor')),
+                (trace, 4, lambda s: s[0], ('transfer_overhead', 'transfer_per_point')),
+                (self.samples['save'], 1, lambda s: s[0], ('save_overhead', 'save_per_point'))):
+            pts = [(x_of(s), s[col]) for s in samples if s[col] is not None]
+            if len(pts) < 2:
+                continue
+            x, t = np.array(pts, dtype=float).T
+            if np.ptp(x) == 0:
+                # one setting only: keep the slope, fit the offset
+                self.coef[names[0]] = max(float(np.mean(t - self.coef[names[1]]*x)), 0.)
+                continue
+            slope, offset = np.polyfit(x, t, 1)
+            self.coef[names[0]] = max(float(offset), 0.)
+            self.coef[names[1]] = max(float(slope), 0.)
+
+        for axis, samples in self.samples['settle'].items():
+            p, m = np.array(samples, dtype=float).T
+            if np.sum(p) > 0:
+                self.settle_scale[axis] = float(np.sum(m)/np.sum(p))
+        return self.coef
+
+    def trace_time(self, npts, ifbw, averages=1, save=True):
+        """{'sweep', 'transfer', 'save'} seconds for one trace."""
+        c = self.coef
+        return {'sweep': c['sweep_overhead'] + c['sweep_factor']*npts*averages/ifbw,
+                'transfer': c['transfer_overhead'] + c['transfer_per_point']*npts,
+                'save': c['save_overhead'] + c['save_per_point']*npts if save else 0.}
+
+    def settle_time(self, axis, step):
+        """
+        Predicted seconds to move and settle axis (a SweepAxis) by step;
+        step None (start position unknown) takes the settler's worst case.
+        """
+        settle = axis.settle
+        if hasattr(settle, 'predicted'):
+            t = settle.predicted(step)
+        elif isinstance(settle, (int, float)):
+            t = float(settle)
+        else:
+            t = 0.
+        return self.coef['move_overhead'] + t*self.settle_scale.get(axis.name, 1.)
+
+
+class SweepPlan:
+    """Result of plan(): point count, violations and predicted times (s)."""
+    def __init__(self, npoints, errors, breakdown, ramp):
+        self.npoints = npoints
+        self.errors = errors
+        self.breakdown = breakdown
+        self.ramp = ramp
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    @property
+    def total(self):
+        return sum(self.breakdown.values())
+
+    def raise_errors(self):
+        if self.errors:
+            raise ValueError('Sweep failed preflight:\n  ' + '\n  '.join(self.errors))
+
+    def __str__(self):
+        lines = ['{} points, about {:.1f} min'.format(self.npoints, self.total/60)]
+        for key, t in sorted(self.breakdown.items(), key=lambda kv: -kv[1]):
+            lines.append('  {:<16} {:8.1f} s'.format(key, t))
+        lines.extend('  LIMIT: ' + e for e in self.errors)
+        return '\n'.join(lines)
+
+
+def plan(sweep, model, npts, ifbw, averages=1, save=True, position=None):
+    """
+    Dry run of a Sweep: check every setpoint against its axis limits and
+    predict the runtime with model, without touching any instrument.
+    npts may be a single value or a callable npts(point) for sweeps whose
+    trace length changes from point to point.
+    """
+    errors = []
+    for ax in sweep.axes:
+        try:
+            ax.check()
+        except ValueError as e:
+            errors.append(str(e))
+
+    breakdown = {'sweep': 0., 'transfer': 0., 'save': 0.}
+    breakdown.update({'settle ' + name: 0. for name in sweep.names})
+    current = list(position) if position is not None else [None]*len(sweep.axes)
+    n = 0
+    for _, values in sweep.points(current):
+        for k, (ax, value) in enumerate(zip(sweep.axes, values)):
+            if current[k] is None or current[k] != value:
+                if ax.reset is not None and ax.against(value, current[k]):
+                    # settles at the reset point first, see SweepAxis.move
+                    breakdown['settle ' + ax.name] += model.settle_time(ax, ax.reset - current[k])
+                    current[k] = ax.reset
+                step = None if current[k] is None else value - current[k]
+                breakdown['settle ' + ax.name] += model.settle_time(ax, step)
+                current[k] = value
+        n_pts = npts(dict(zip(sweep.names, values))) if callable(npts) else npts
+        for key, t in model.trace_time(n_pts, ifbw, averages, save).items():
+            breakdown[key] += t
+        n += 1
+    return SweepPlan(n, errors, breakdown, sweep.ramp(position))
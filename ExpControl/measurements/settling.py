@@ -0,0 +1,167 @@
+import logging
+import time
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+
+class Settler:
+    """
+    Decides when a stepped quantity (field, current, ...) has settled.
+
+    The wait has up to three parts:
+    - a model: dead_time + |step|/rate seconds, or model(step) when given
+      (e.g. the magnet driver's own ramp model), at least min_wait
+      (rate=None means the step size does not matter). The model wait is
+      never cut short, so long ramps get their full time. An unknown step
+      (previous=None) waits max_wait.
+    - readback: poll readback() until it is within tolerance of the target
+      for stable_count consecutive polls
+    - snapshots: poll snapshot() (e.g. a fast VNA trace) until consecutive
+      arrays agree to within snapshot_tolerance
+
+    Polling starts after the model wait and gives up after max_wait. For
+    quantities without a true readback the model is the only criterion.
+    The actual settle time of every
+    step is logged and kept in history as (target, step, seconds).
+    """
+    def __init__(self, name, dead_time=0., rate=None, min_wait=0., max_wait=60.,
+                 readback=None, tolerance=None, snapshot=None,
+                 snapshot_tolerance=None, poll_interval=0.2, stable_count=2,
+                 model=None):
+        self.name = name
+        self.dead_time = dead_time
+        self.rate = rate
+        self.model = model
+        self.min_wait = min_wait
+        self.max_wait = max_wait
+        self.readback = readback
+        self.tolerance = tolerance
+        self.snapshot = snapshot
+        self.snapshot_tolerance = snapshot_tolerance
+        self.poll_interval = poll_interval
+        self.stable_count = stable_count
+        self.history = []
+
+    def configure(self, **kwargs):
+        for key, val in kwargs.items():
+            if not hasattr(self, key) or key in ('name', 'history'):
+                raise AttributeError('Settler has no setting {}'.format(key))
+            setattr(self, key, val)
+
+    def predicted(self, step):
+        """Model wait (s) for a step of the given size (None: unknown)."""
+        if step is None:
+            return self.max_wait
+        if self.model is not None:
+            t = self.model(step)
+        else:
+            t = self.dead_time
+            if self.rate:
+                t += abs(step)/self.rate
+        return max(t, self.min_wait)
+
+    def wait(self, target, previous=None):
+        """Block until settled at target after stepping from previous."""
+        t0 = time.monotonic()
+        step = None if previous is None else target - previous
+        time.sleep(self.predicted(step))
+        deadline = time.monotonic() + self.max_wait
+
+        if self.readback is not None and self.tolerance is not None:
+            self._poll(lambda: abs(self.readback() - target) <= self.tolerance,
+                       deadline)
+
+        if self.snapshot is not None and self.snapshot_tolerance is not None:
+            last = [np.asarray(self.snapshot())]
+            def converged():
+                new = np.asarray(self.snapshot())
+                ok = np.max(np.abs(new - last[0])) <= self.snapshot_tolerance
+                last[0] = new
+                return ok
+            self._poll(converged, deadline)
+
+        elapsed = time.monotonic() - t0
+        self.history.append((target, step, elapsed))
+        log.info('%s settled at %s (step %s) in %.2f s', self.name, target,
+                 step, elapsed)
+        return elapsed
+
+    def _poll(self, check, deadline):
+        count = 0
+        while time.monotonic() < deadline:
+            count = count + 1 if check() else 0
+            if count >= self.stable_count:
+                return True
+            time.sleep(self.poll_interval)
+        log.warning('%s did not settle within %.1f s', self.name, self.max_wait)
+        return False
+
+
+class TemperatureGate:
+    """
+    Wait for a stable temperature before measuring.
+
+    Temperature is sampled every 'interval' seconds; once 'window' seconds
+    of samples are available, a straight line is fitted to them and the
+    temperature counts as stable when |dT/dt| <= max_slope (K/min) and the
+    scatter about the line is <= max_std (K).
+
+    read() returns the temperature. history(), if given, returns (time, T)
+    rows already logged (e.g. a Keithley stream), which fills the window
+    without waiting.
+    """
+    def __init__(self, read, history=None, window=60., interval=2.,
+                 max_slope=1e-03, max_std=1e-03, timeout=3600.):
+        self.read = read
+        self.history = history
+        self.window = window
+        self.interval = interval
+        self.max_slope = max_slope
+        self.max_std = max_std
+        self.timeout = timeout
+
+    def configure(self, **kwargs):
+        for key, val in kwargs.items():
+            if not hasattr(self, key):
+                raise AttributeError('TemperatureGate has no setting {}'.format(key))
+            setattr(self, key, val)
+
+    def check(self, t, temp):
+        """(stable, slope K/min, std K) for samples spanning the window."""
+        t = np.asarray(t, dtype=float)
+        temp = np.asarray(temp, dtype=float)
+        if len(t) < 3 or t[-1] - t[0] < self.window:
+            return False, np.nan, np.nan
+        slope, offset = np.polyfit(t - t[0], temp, 1)
+        std = np.std(temp - (slope*(t - t[0]) + offset))
+        slope *= 60
+        return abs(slope) <= self.max_slope and std <= self.max_std, slope, std
+
+    def wait(self, timeout=None):
+        """Block until stable; raises TimeoutError after timeout seconds."""
+        timeout = self.timeout if timeout is None else timeout
+        t0 = time.time()
+        samples = []
+        while True:
+            if self.history is not None:
+                rows = np.asarray(self.history(), dtype=float).reshape(-1, 2)
+            else:
+                samples.append((time.time(), self.read()))
+                rows = np.array(samples)
+            # keep the newest samples spanning just over the window
+            if len(rows):
+                i = max(np.searchsorted(rows[:, 0], rows[-1, 0] - self.window, side='right') - 1, 0)
+                rows = rows[i:]
+                samples = samples[i:]
+            t, temp = rows[:, 0], rows[:, 1]
+
+            stable, slope, std = self.check(t, temp)
+            if stable:
+                log.info('Temperature stable at %.4f K after %.0f s (dT/dt %.2e K/min, std %.2e K)',
+                         temp[-1], time.time() - t0, slope, std)
+                return temp[-1]
+            if time.time() - t0 > timeout:
+                raise TimeoutError('Temperature not stable after {:.0f} s '
+                                   '(dT/dt {:.2e} K/min, std {:.2e} K)'.format(timeout, slope, std))
+            time.sleep(self.interval)
@@ -0,0 +1,254 @@
+import itertools
+import logging
+import time
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+
+def _setter_range(setter):
+    # (low, high) of a qcodes parameter's Numbers validator, None if it has
+    # none; older qcodes only has the private attributes
+    vals = getattr(setter, 'vals', None)
+    low = getattr(vals, 'min_value', getattr(vals, '_min_value', None))
+    high = getattr(vals, 'max_value', getattr(vals, '_max_value', None))
+    if low is None or high is None:
+        return None
+    return low, high
+
+
+class SweepAxis:
+    """
+    One axis of a Sweep.
+
+    setter(value) moves the instrument. settle runs after each move: a
+    Settler (anything with wait(target, previous)), a callable
+    settle(target, previous) or a fixed delay in seconds. limits is an
+    optional (low, high) range every value must lie inside; a setter with
+    a range validator (qcodes Numbers) narrows it to what the instrument
+    accepts, so check() catches those values before the sweep. getter()
+    reads back where the axis is now, so the first move settles for the
+    real step; without one the first step is unknown and the settler
+    assumes the worst case.
+
+    direction='up' or 'down' is a hysteresis constraint: the axis is always
+    traversed in that direction and never reversed by the sweep ordering.
+    A move against it first goes to reset (e.g. below the lowest value for
+    'up') when one is given.
+    """
+    def __init__(self, name, values, setter, settle=None, limits=None, unit='', direction=None, reset=None, getter=None):
+        if direction not in (None, 'up', 'down'):
+            raise ValueError("direction must be None, 'up' or 'down'")
+        self.name = name
+        self.values = np.asarray(values)
+        self.setter = setter
+        self.getter = getter
+        self.settle = settle
+        hard = _setter_range(setter)
+        if hard is not None:
+            limits = hard if limits is None else (max(limits[0], hard[0]), min(limits[1], hard[1]))
+        self.limits = limits
+        self.unit = unit
+        self.direction = direction
+        self.reset = reset
+
+    def __len__(self):
+        return len(self.values)
+
+    def position(self):
+        """Current value read back with getter, None if unknown."""
+        return None if self.getter is None else self.getter()
+
+    def check(self, values=None):
+        """Raise ValueError if any value is outside the limits."""
+        if self.limits is None:
+            return
+        values = self.values if values is None else np.asarray(values)
+        if self.reset is not None:
+            values = np.append(values, self.reset)
+        low, high = self.limits
+        bad = values[(values < low) | (values > high)]
+        if bad.size:
+            raise ValueError('{} = {} {} is outside the limits [{}, {}]'.format(
+                self.name, bad[0], self.unit, low, high))
+
+    def against(self, value, previous):
+        """True if moving previous -> value goes against direction."""
+        if previous is None or self.direction is None:
+            return False
+        if self.direction == 'up':
+            return value < previous
+        return value > previous
+
+    def sequence(self, order, position=None, flip=False):
+        """
+        Indices into values in the order this axis is traversed.
+
+        'raster' keeps the declared order, 'serpentine' reverses it when
+        flip is set and 'min_ramp' sorts the values and starts from the end
+        nearer to position. A direction constraint always wins.
+        """
+        idx = np.arange(len(self.values))
+        if order == 'min_ramp' or self.direction is not None:
+            idx = idx[np.argsort(self.values, kind='stable')]
+        if self.direction == 'down':
+            return idx[::-1]
+        if self.direction == 'up':
+            return idx
+        if order == 'serpentine' and flip:
+            return idx[::-1]
+        if order == 'min_ramp' and position is not None:
+            if abs(self.values[idx[-1]] - position) < abs(self.values[idx[0]] - position):
+                return idx[::-1]
+        return idx
+
+    def move(self, value, previous=None):
+        if self.reset is not None and self.against(value, previous):
+            # the reset point has to be reached, not just passed through
+            self.setter(self.reset)
+            self.wait(self.reset, previous)
+            previous = self.reset
+        self.setter(value)
+        self.wait(value, previous)
+
+    def wait(self, target, previous=None):
+        if self.settle is None:
+            return
+        if hasattr(self.settle, 'wait'):
+            self.settle.wait(target, previous)
+        elif callable(self.settle):
+            self.settle(target, previous)
+        else:
+            time.sleep(self.settle)
+
+
+class Sweep:
+    """
+    An N-dimensional sweep declared as nested axes, outermost first.
+
+    At every point the axes whose value changed are moved, outer first and
+    each followed by its settling, then acquire(point) is called with a dict
+    of axis name -> value and store(index, point, result) with the index
+    tuple of the point. All limits are checked before anything moves.
+
+    order sets the acquisition order:
+      'raster'      every inner axis restarts from its first value
+      'serpentine'  inner axes run back and forth (boustrophedon)
+      'min_ramp'    every axis is sorted and entered from the end nearer
+                    to where it currently is
+    Axes with a direction constraint are never reversed. Indices always
+    refer to the declared axis values, whatever the order, so results can
+    be put on a grid directly (see grid).
+
+        sweep = Sweep([field_axis, power_axis], acquire, store, order='serpentine')
+        results = sweep.run()   # {index tuple: result}
+    """
+    ORDERS = ('raster', 'serpentine', 'min_ramp')
+
+    def __init__(self, axes, acquire, store=None, order='raster'):
+        if order not in self.ORDERS:
+            raise ValueError('order must be one of {}'.format(self.ORDERS))
+        self.axes = list(axes)
+        self.acquire = acquire
+        self.store = store
+        self.order = order
+
+    @property
+    def shape(self):
+        return tuple(len(ax) for ax in self.axes)
+
+    @property
+    def names(self):
+        return [ax.name for ax in self.axes]
+
+    def points(self, position=None):
+        """
+        (index tuple, value tuple) for every point in acquisition order.
+        position: current value of each axis (None where unknown), used by
+        'min_ramp' to pick where to start.
+        """
+        position = list(position) if position is not None else [None]*len(self.axes)
+        passes = [0]*len(self.axes)
+
+        def walk(k, index):
+            if k == len(self.axes):
+                yield tuple(index)
+                return
+            ax = self.axes[k]
+            for i in ax.sequence(self.order, position[k], passes[k] % 2 == 1):
+                position[k] = ax.values[i]
+                yield from walk(k + 1, index + [i])
+            passes[k] += 1
+
+        for index in walk(0, []):
+            yield index, tuple(ax.values[i] for ax, i in zip(self.axes, index))
+
+    def ramp(self, position=None):
+        """Total distance moved by each axis, {name: distance}."""
+        current = list(position) if position is not None else [None]*len(self.axes)
+        total = dict.fromkeys(self.names, 0.0)
+        for _, values in self.points(current):
+            for k, (ax, value) in enumerate(zip(self.axes, values)):
+                if current[k] is not None and current[k] != value:
+                    if ax.reset is not None and ax.against(value, current[k]):
+                        total[ax.name] += abs(ax.reset - current[k]) + abs(value - ax.reset)
+                    else:
+                        total[ax.name] += abs(value - current[k])
+                current[k] = value
+        return total
+
+    def grid(self, results, fill=np.nan):
+        """results {index: scalar} as an array of shape self.shape."""
+        out = np.full(self.shape, fill, dtype=float)
+        for index, value in results.items():
+            out[index] = value
+        return out
+
+    def spec(self):
+        """Plain description of the sweep, e.g. for a SweepJournal."""
+        return {'order': self.order,
+                'axes': [{'name': ax.name, 'values': ax.values.tolist(), 'unit': ax.unit,
+                          'direction': ax.direction, 'reset': ax.reset} for ax in self.axes]}
+
+    def check(self):
+        for ax in self.axes:
+            ax.check()
+
+    def position(self):
+        """Current value of every axis (None where it has no getter)."""
+        return [ax.position() for ax in self.axes]
+
+    def run(self, position=None, journal=None):
+        """
+        Run the sweep and return {index: result}. With a SweepJournal every
+        completed point is marked in it and points it already holds are
+        skipped, so an interrupted sweep resumes where it stopped (skipped
+        points are not in the returned results). position defaults to what
+        the axes read back (see SweepAxis.getter). A point is marked once
+        store() has returned, so a journal needs a store that keeps the
+        result.
+        """
+        if journal is not None and self.store is None:
+            raise ValueError('A journal needs a store: unstored points would be skipped on resume')
+        self.check()
+        results = {}
+        current = list(position) if position is not None else self.position()
+        t0 = time.time()
+        for index, values in self.points(current):
+            if journal is not None and index in journal:
+                continue
+            for k, (ax, value) in enumerate(zip(self.axes, values)):
+                if current[k] is None or current[k] != value:
+                    ax.move(value, current[k])
+                    current[k] = value
+            point = dict(zip(self.names, values))
+            result = self.acquire(point)
+            if self.store is not None:
+                self.store(index, point, result)
+            results[index] = result
+            if journal is not None:
+                journal.mark(index)
+        if journal is not None:
+            journal.finish()
+        log.info('Sweep of %d points took %.1f s', len(results), time.time() - t0)
+        return results
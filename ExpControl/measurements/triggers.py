@@ -0,0 +1,93 @@
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+
+class CrossingTrigger:
+    """
+    Fires an acquisition each time a monitored value (e.g. temperature
+    during a free cooldown) crosses one of a list of setpoints.
+
+    direction is 'down' (cooldown), 'up' (warm up) or 'both'. Each setpoint
+    fires once; for 'down' and 'up', setpoints the first reading is already
+    past are dropped with a warning. action(setpoint) does the acquisition;
+    the value read just before and just after it is stored with the result
+    in records, as dicts with setpoint, value_start, value_end, time_start,
+    time_end and result. on_record(record) is called as soon as each record
+    is complete, e.g. to save it before the next crossing; whatever it
+    returns replaces the result kept in records (None keeps it).
+
+    trig = CrossingTrigger([4.2, 4.0, 3.8], acquire)
+    trig.run(read_temperature)
+    """
+    def __init__(self, setpoints, action, direction='down', on_record=None):
+        if direction not in ('down', 'up', 'both'):
+            raise ValueError('direction must be \'down\', \'up\' or \'both\'')
+        self.pending = sorted(setpoints, reverse=(direction != 'up'))
+        self.action = action
+        self.on_record = on_record
+        self.direction = direction
+        self.records = []
+        self._last = None
+
+    def crossed(self, value):
+        """Setpoints crossed since the previous value, in crossing order."""
+        last, self._last = self._last, value
+        if last is None:
+            self._drop_passed(value)
+            return []
+        hits = []
+        for sp in self.pending:
+            down = last > sp >= value
+            up = last < sp <= value
+            if ((down and self.direction in ('down', 'both')) or
+                    (up and self.direction in ('up', 'both'))):
+                hits.append(sp)
+        if value < last:
+            hits.sort(reverse=True)
+        else:
+            hits.sort()
+        return hits
+
+    def _drop_passed(self, value):
+        # setpoints the first reading is already past can never be crossed
+        # in a one-way direction, so run() would wait for them forever
+        if self.direction == 'down':
+            passed = [sp for sp in self.pending if sp >= value]
+        elif self.direction == 'up':
+            passed = [sp for sp in self.pending if sp <= value]
+        else:
+            passed = []
+        if passed:
+            log.warning('Skipping setpoints %s, already passed at %s', passed, value)
+            self.pending = [sp for sp in self.pending if sp not in passed]
+
+    def fire(self, setpoint, read):
+        t_start, v_start = time.time(), read()
+        result = self.action(setpoint)
+        t_end, v_end = time.time(), read()
+        self.pending.remove(setpoint)
+        record = {'setpoint': setpoint, 'value_start': v_start, 'value_end': v_end,
+                  'time_start': t_start, 'time_end': t_end, 'result': result}
+        if self.on_record is not None:
+            kept = self.on_record(record)
+            if kept is not None:
+                record['result'] = kept
+        self.records.append(record)
+        log.info('Triggered at %s: %.4f -> %.4f', setpoint, v_start, v_end)
+        return record
+
+    def update(self, value, read):
+        return [self.fire(sp, read) for sp in self.crossed(value)]
+
+    def run(self, read, interval=0.5, timeout=None):
+        """Poll read() until every setpoint has fired (or timeout seconds)."""
+        t0 = time.time()
+        while self.pending:
+            if timeout is not None and time.time() - t0 > timeout:
+                log.warning('Stopped with setpoints %s not reached', self.pending)
+                break
+            self.update(read(), read)
+            time.sleep(interval)
+        return self.records
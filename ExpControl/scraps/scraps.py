@@ -18,10 +18,22 @@ class ScrapsWrapper:
     def pkl_to_s2p(self,pkl_file,s2p_file):
         pkl = pickle.load(open(pkl_file,'rb'))
 
+        # Traces taken with iq=True carry the real I/Q data; older files only
+        # have mag/phase in ch1/ch2
+        if 'I' in pkl.columns:
+            I, Q = pkl.I.values, pkl.Q.values
+        else:
+            I, Q = pkl.ch1.values, pkl.ch2.values
+
         with open(s2p_file, 'w') as f:
             writer = csv.writer(f, delimiter='\t')
             writer.writerow(["Frequency", "I", "Q"])
-            writer.writerows(zip(pkl.freq,pkl.ch1.values,pkl.ch2.values))
+            writer.writerows(zip(pkl.freq,I,Q))
+
+    def trace_to_dict(self,freq,sdata,name,temp,pwr):
+        """Build a scraps data dict straight from a complex VNA trace."""
+        return {'name':name,'temp':temp,'pwr':pwr,
+                'freq':np.asarray(freq),'I':sdata.real,'Q':sdata.imag}
 
     def process_file(self,fileName,file, mask = None, meta_only=False, **loadtxt_kwargs):
         """Load Keysight PNA file data into dict."""